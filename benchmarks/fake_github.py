@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STATS_PATH = "/_stats"
+# POST a JSON list of titles here to replace every issue with that set of open ones
+ISSUES_RESET_PATH = "/_issues"
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+class FakeGitHubState:
+    # The issues of one repository, and a rate-limit budget shared by every request like GitHub's per token
+    def __init__(self, rate_limit=5000, rate_window=3600.0, retry_after=None, http_date=False, latency=0.0):
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.retry_after = retry_after
+        self.http_date = http_date
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.issues = {}
+        self.next_number = 1
+        self.window_start = time.time()
+        self.used = 0
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.not_modified = 0
+            self.created = 0
+            self.closed = 0
+            self.limited = 0
+
+    def replace_issues(self, titles):
+        with self.lock:
+            self.issues = {}
+            self.next_number = 1
+            for title in titles:
+                self.add_issue(title)
+
+    def add_issue(self, title, body=""):
+        number = self.next_number
+        self.next_number += 1
+        self.issues[number] = {"number": number, "title": title, "body": body, "state": "open", "state_reason": None}
+        return self.issues[number]
+
+    def open_issues(self):
+        # Newest first, like the issues list
+        return [issue for _, issue in sorted(self.issues.items(), reverse=True) if issue["state"] == "open"]
+
+    def spend(self):
+        # (allowed, rate-limit headers); a 304 answer is not counted, like on GitHub
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.rate_window:
+                self.window_start = now
+                self.used = 0
+            reset_at = self.window_start + self.rate_window
+            allowed = self.used < self.rate_limit
+            if allowed:
+                self.used += 1
+            else:
+                self.limited += 1
+            headers = {
+                "X-RateLimit-Limit": str(self.rate_limit),
+                "X-RateLimit-Remaining": str(max(0, self.rate_limit - self.used)),
+                "X-RateLimit-Reset": str(int(reset_at) + 1),
+            }
+            if not allowed and self.retry_after is not None:
+                headers["Retry-After"] = formatdate(now + self.retry_after, usegmt=True) if self.http_date else f"{self.retry_after:g}"
+            return allowed, headers
+
+    def refund(self):
+        with self.lock:
+            self.used = max(0, self.used - 1)
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, every keep-alive answer waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError:
+            return None
+
+    def issues_path(self):
+        # "/repos/{owner}/{repo}/issues" or ".../issues/{number}" -> (True, number or None)
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) < 4 or parts[0] != "repos" or parts[3] != "issues":
+            return False, None
+        if len(parts) == 4:
+            return True, None
+        if len(parts) == 5 and parts[4].isdigit():
+            return True, int(parts[4])
+        return False, None
+
+    def begin(self):
+        # Counts the request and spends the rate limit; the rate-limit headers, None when an error was sent instead
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.headers.get("Authorization", "").strip() in ("", "Bearer", "Bearer None"):
+            self.send_json(401, {"message": "Requires authentication"})
+            return None
+        allowed, headers = self.state.spend()
+        if not allowed:
+            self.send_json(403, {"message": "API rate limit exceeded"}, headers)
+            return None
+        return headers
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path.startswith(STATS_PATH):
+            state = self.state
+            with state.lock:
+                stats = {
+                    "requests": state.requests, "not_modified": state.not_modified, "created": state.created,
+                    "closed": state.closed, "limited": state.limited, "open": len(state.open_issues()), "bytes_sent": 0
+                }
+            if path.endswith("/reset"):
+                state.reset()
+            return self.send_json(200, stats)
+
+        is_issues, number = self.issues_path()
+        if not is_issues or number is not None:
+            return self.send_json(404, {"message": "Not Found"})
+        headers = self.begin()
+        if headers is None:
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        per_page = min(MAX_PER_PAGE, int(query.get("per_page", [DEFAULT_PER_PAGE])[0]))
+        page = max(1, int(query.get("page", [1])[0]))
+        with self.state.lock:
+            issues = self.state.open_issues()
+        listed = issues[(page - 1) * per_page:page * per_page]
+        payload = [{"number": issue["number"], "title": issue["title"], "state": issue["state"]} for issue in listed]
+        if page * per_page < len(issues):
+            host = self.headers.get("Host", f"127.0.0.1:{self.server.server_address[1]}")
+            next_url = f"http://{host}{path}?state=open&per_page={per_page}&page={page + 1}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        etag = f'"{hashlib.sha1(json.dumps([payload, headers.get("Link")]).encode()).hexdigest()}"'
+        headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            self.state.refund()
+            with self.state.lock:
+                self.state.not_modified += 1
+            return self.send_json(304, None, headers)
+        self.send_json(200, payload, headers)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == ISSUES_RESET_PATH:
+            titles = self.read_json()
+            if not isinstance(titles, list):
+                return self.send_json(422, {"message": "Expected a list of titles"})
+            self.state.replace_issues(titles)
+            return self.send_json(200, {"open": len(titles)})
+
+        is_issues, number = self.issues_path()
+        if not is_issues or number is not None:
+            return self.send_json(404, {"message": "Not Found"})
+        headers = self.begin()
+        if headers is None:
+            return
+        data = self.read_json()
+        if not isinstance(data, dict) or not data.get("title"):
+            return self.send_json(422, {"message": "Validation Failed"}, headers)
+        with self.state.lock:
+            issue = self.state.add_issue(data["title"], data.get("body", ""))
+            self.state.created += 1
+        self.send_json(201, issue, headers)
+
+    def do_PATCH(self):
+        is_issues, number = self.issues_path()
+        if not is_issues or number is None:
+            return self.send_json(404, {"message": "Not Found"})
+        headers = self.begin()
+        if headers is None:
+            return
+        data = self.read_json() or {}
+        with self.state.lock:
+            issue = self.state.issues.get(number)
+            if issue is None:
+                return self.send_json(404, {"message": "Not Found"}, headers)
+            if data.get("state") == "closed" and issue["state"] == "open":
+                self.state.closed += 1
+            issue.update({key: data[key] for key in ("state", "state_reason", "title", "body") if key in data})
+        self.send_json(200, issue, headers)
+
+def start_server(port=0, issues=None, **options):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGitHubHandler)
+    server.daemon_threads = True
+    server.state = FakeGitHubState(**options)
+    server.state.replace_issues(issues or [])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake GitHub issues API to exercise the issue sync")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--issues", help="JSON file with the titles of the issues open at start")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Counted requests allowed per window")
+    parser.add_argument("--rate-window", type=float, default=3600.0, help="Seconds until the rate limit resets")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent once the rate limit is spent")
+    parser.add_argument("--http-date", action="store_true", help="Send Retry-After as an HTTP date instead of seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every response")
+    args = parser.parse_args()
+
+    issues = []
+    if args.issues:
+        with open(args.issues, "r") as f:
+            issues = json.load(f)
+    server = start_server(args.port, issues, rate_limit=args.rate_limit, rate_window=args.rate_window,
+        retry_after=args.retry_after, http_date=args.http_date, latency=args.latency)
+    # The first line tells the parent process where to connect, as GITHUB_API_URL
+    print(f"PORT {server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
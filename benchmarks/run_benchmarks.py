@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+from urllib.request import Request, urlopen
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import mod_cache
+import release_notes
+import update_dependencies as updater
+from synthetic_index import DATA_DIR, MANIFEST_SIZES, ensure_index, manifest_dependencies
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_INDEX_SIZES = [1000, 10000]
+# Differences below this are noise whatever the ratio says
+MIN_SECONDS_DELTA = 0.005
+MIN_BYTES_DELTA = 256 * 1024
+
+class Standin:
+    # The stand-in runs in its own process so its allocations and GIL time stay out of the measurements
+    def __init__(self, index_path, latency=0.0, fail_rate=0.0, drop_rate=0.0, retry_after=0.0):
+        self.command = [
+            sys.executable, os.path.join(BENCH_DIR, "standin_server.py"),
+            "--index", index_path,
+            "--latency", str(latency),
+            "--fail-rate", str(fail_rate),
+            "--drop-rate", str(drop_rate),
+            "--retry-after", str(retry_after)
+        ]
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, text=True)
+        port = int(self.process.stdout.readline().split()[1])
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+    def stats(self, reset=False):
+        with urlopen(f"{self.url}/_stats{'/reset' if reset else ''}") as resp:
+            return json.load(resp)
+
+class FakeGitHub:
+    # The fake issues API, in its own process like the stand-in; has the same stats() as Standin
+    def __init__(self):
+        self.command = [sys.executable, os.path.join(BENCH_DIR, "fake_github.py")]
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, stdout=subprocess.PIPE, text=True)
+        port = int(self.process.stdout.readline().split()[1])
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+
+    def stats(self, reset=False):
+        with urlopen(f"{self.url}/_stats{'/reset' if reset else ''}") as resp:
+            return json.load(resp)
+
+    def replace_issues(self, titles):
+        request = Request(f"{self.url}/_issues", data=json.dumps(titles).encode(), method="POST")
+        with urlopen(request) as resp:
+            return json.load(resp)
+
+def measure(phase, standin, repeat, run, setup=None):
+    # Best-of-N wall time without tracing, then one traced run for the Python heap peak
+    standin.stats(reset=True)
+    timings = []
+    result = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            state = setup() if setup else None
+            start = time.perf_counter()
+            result = run(state)
+            timings.append(time.perf_counter() - start)
+        state = setup() if setup else None
+        tracemalloc.start()
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    stats = standin.stats()
+    runs = repeat + 1
+    return {
+        "phase": phase,
+        "seconds": min(timings),
+        "peak_python_bytes": peak,
+        "bytes_transferred": stats["bytes_sent"] // runs,
+        "requests": stats["requests"] // runs
+    }, result
+
+def fetch_args(cache_dir=None, cache_ttl=0):
+    return dict(max_retries=3, retry_delay=0, timeout_time=30, verbose=False, cache_dir=cache_dir, cache_ttl=cache_ttl)
+
+def fresh_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+def bench_index(index_size, manifest_sizes, repeat, workdir, faults):
+    index_path = ensure_index(index_size)
+    results = []
+    with Standin(index_path, **faults) as standin:
+        updater.THUNDERSTORE_API = f"{standin.url}/c/repo/api/v1/package/"
+        updater.THUNDERSTORE_PACKAGE_API = f"{standin.url}/api/experimental/package/"
+        mod_cache.THUNDERSTORE_DOWNLOAD_URL = f"{standin.url}/package/download/{{namespace}}/{{name}}/{{version}}/"
+        cache_dir = os.path.join(workdir, "cache")
+
+        # Index-wide phases do not depend on the manifest
+        result, _ = measure("fetch_cold_cache", standin, repeat,
+            lambda _: updater.fetch_thunderstore_packages(**fetch_args(cache_dir)),
+            setup=lambda: fresh_dir(cache_dir))
+        results.append(dict(result, index_size=index_size, manifest_size=None))
+        result, _ = measure("fetch_revalidate", standin, repeat,
+            lambda _: updater.fetch_thunderstore_packages(**fetch_args(cache_dir)))
+        results.append(dict(result, index_size=index_size, manifest_size=None))
+
+        for manifest_size in manifest_sizes:
+            if manifest_size > index_size:
+                continue
+            dependencies = manifest_dependencies(index_size, manifest_size)
+            # The snapshot drops a few entries and carries one that left the manifest
+            snapshot = updater.snapshot_entries(dependencies[manifest_size // 10:] + [dependencies[0].replace("-", "Gone-", 1)])
+            wanted = updater.dependency_names(dependencies) | set(snapshot)
+            args = Namespace(verbose=False)
+            rows = []
+
+            result, lookup = measure("fetch_stream", standin, repeat,
+                lambda _: updater.fetch_thunderstore_packages(wanted=wanted, **fetch_args()))
+            rows.append(result)
+            result, _ = measure("fetch_targeted", standin, repeat,
+                lambda _: updater.fetch_targeted_packages(wanted, max_retries=3, retry_delay=0, timeout_time=30, max_concurrency=8))
+            rows.append(result)
+            result, changes = measure("process_dependencies", standin, repeat,
+                lambda _: updater.process_dependencies(dependencies, snapshot, lookup, args))
+            rows.append(result)
+            result, _ = measure("snapshot_diff", standin, repeat,
+                lambda _: changes.finish(lookup))
+            rows.append(result)
+            # Second run against the snapshot the first one wrote: nothing changed upstream, nothing is evaluated
+            result, _ = measure("process_incremental", standin, repeat,
+                lambda _: updater.process_dependencies(changes.dependencies, changes.next_snapshot, lookup, args))
+            rows.append(result)
+
+            notes_dir = os.path.join(workdir, "release-notes")
+
+            def fetch_notes(_):
+                return release_notes.fetch_release_notes(changes.updated, updater.THUNDERSTORE_PACKAGE_API, updater.USER_AGENT,
+                    release_notes.NotesCache(notes_dir), max_workers=8, timeout_time=30, deadline=60)
+
+            result, _ = measure("release_notes_cold", standin, repeat, fetch_notes, setup=lambda: fresh_dir(notes_dir))
+            rows.append(result)
+            result, notes = measure("release_notes_warm", standin, repeat, fetch_notes)
+            rows.append(result)
+
+            changelog_dir = os.path.join(workdir, "changelog")
+
+            def reset_changelog():
+                fresh_dir(changelog_dir)
+                shutil.copy(os.path.join(ROOT_DIR, "CHANGELOG.md"), changelog_dir)
+
+            def write_changelog(_):
+                cwd = os.getcwd()
+                os.chdir(changelog_dir)
+                try:
+                    updater.update_changelog("9.9.9", changes, notes=notes)
+                finally:
+                    os.chdir(cwd)
+
+            result, _ = measure("update_changelog", standin, repeat, write_changelog, setup=reset_changelog)
+            rows.append(result)
+
+            mods_dir = os.path.join(workdir, "mods")
+
+            def download(_):
+                return mod_cache.download_mods(dependencies, lookup, mod_cache.ModCache(mods_dir), max_concurrency=8,
+                    timeout_time=30, max_retries=3, retry_delay=0, user_agent=updater.USER_AGENT)
+
+            result, _ = measure("download_mods_cold", standin, repeat, download, setup=lambda: fresh_dir(mods_dir))
+            rows.append(result)
+            result, _ = measure("download_mods_warm", standin, repeat, download)
+            rows.append(result)
+
+            rows.extend(bench_issue_sync(dependencies, repeat, workdir))
+            results.extend(dict(row, index_size=index_size, manifest_size=manifest_size) for row in rows)
+    return results
+
+def seed_issues(dependencies):
+    # Open issues before the sync: a page and a half of unrelated ones, the older half of the missing mods already
+    # filed (one of them twice by an earlier run), and a few for mods that came back since
+    missing = dependencies[:max(2, len(dependencies) // 10)]
+    titles = [f"Unrelated issue {number}" for number in range(150)]
+    titles += [f"{updater.MISSING_ISSUE_PREFIX}{dep}" for dep in missing[len(missing) // 2:]]
+    titles.append(f"{updater.MISSING_ISSUE_PREFIX}{missing[-1]}")
+    titles += [f"{updater.MISSING_ISSUE_PREFIX}{dep}" for dep in dependencies[-3:]]
+    return missing, titles
+
+def bench_issue_sync(dependencies, repeat, workdir):
+    missing, titles = seed_issues(dependencies)
+    issues_cache_dir = os.path.join(workdir, "issues-cache")
+    rows = []
+    with FakeGitHub() as github:
+        updater.GITHUB_API_URL = github.url
+        updater.GITHUB_TOKEN = "benchmark"
+        updater.GITHUB_REPO = "benchmark/modpack"
+
+        def reset_issues():
+            github.replace_issues(titles)
+            fresh_dir(issues_cache_dir)
+
+        def sync(_):
+            updater.sync_github_issues(missing, cache_dir=issues_cache_dir)
+
+        # Cold: every page is listed and the missing set is filed; warm: the pages revalidate and nothing is written
+        result, _ = measure("issue_sync_cold", github, repeat, sync, setup=reset_issues)
+        rows.append(result)
+        result, _ = measure("issue_sync_warm", github, repeat, sync)
+        rows.append(result)
+    return rows
+
+def result_key(result):
+    return (result["phase"], result["index_size"], result["manifest_size"])
+
+def compare(results, baseline, threshold):
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for metric, min_delta in (("seconds", MIN_SECONDS_DELTA), ("peak_python_bytes", MIN_BYTES_DELTA), ("bytes_transferred", MIN_BYTES_DELTA)):
+            if result[metric] - old[metric] > max(min_delta, old[metric] * threshold):
+                regressions.append((result, metric, old[metric]))
+    return regressions
+
+def format_bytes(value):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024 or unit == "GiB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+def print_results(results):
+    print(f"{'phase':<22}{'index':>9}{'manifest':>10}{'seconds':>10}{'peak heap':>12}{'transferred':>13}{'requests':>10}")
+    for result in results:
+        manifest_size = "-" if result["manifest_size"] is None else result["manifest_size"]
+        print(f"{result['phase']:<22}{result['index_size']:>9}{manifest_size:>10}{result['seconds']:>10.3f}"
+              f"{format_bytes(result['peak_python_bytes']):>12}{format_bytes(result['bytes_transferred']):>13}{result['requests']:>10}")
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the dependency updater against synthetic Thunderstore indexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_INDEX_SIZES, help="Index sizes in packages (100000 and 500000 take a while to generate)")
+    parser.add_argument("--manifest-sizes", type=int, nargs="+", default=MANIFEST_SIZES, help="Manifest sizes in dependencies")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per phase, the best one is kept")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in waits before every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests the stand-in answers with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of index transfers the stand-in cuts off")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds the stand-in sends with its 503 answers")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results as {os.path.relpath(BASELINE_PATH, ROOT_DIR)}")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="Compare against a baseline file (default: the stored baseline)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative increase reported as a regression")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    faults = {"latency": args.latency, "fail_rate": args.fail_rate, "drop_rate": args.drop_rate, "retry_after": args.retry_after}
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Benchmarking index of {size} packages (data in {DATA_DIR})...", flush=True)
+            results.extend(bench_index(size, args.manifest_sizes, args.repeat, workdir, faults))
+
+    print_results(results)
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "faults": faults,
+        "results": results
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{report['commit'] or 'unknown'}-{int(time.time())}.json")
+    with open(result_path, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {result_path}")
+
+    if args.save_baseline:
+        shutil.copy(result_path, BASELINE_PATH)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for result, metric, old in regressions:
+            print(f"REGRESSION {result['phase']} index={result['index_size']} manifest={result['manifest_size']}: {metric} {old} -> {result[metric]}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline.get('commit') or args.compare}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PACKAGE_API_PREFIX = "/api/experimental/package/"
+INDEX_PATH = "/c/repo/api/v1/package/"
+DOWNLOAD_PATH = "/package/download/"
+STATS_PATH = "/_stats"
+MOD_ZIP_SIZE = 256 * 1024
+SEND_BUFFER_SIZE = 64 * 1024
+
+class StandinState:
+    def __init__(self, index_path, latency=0.0, fail_rate=0.0, drop_rate=0.0, retry_after=0.0, seed=0):
+        self.index_path = index_path
+        with open(f"{index_path}.offsets.json", "r") as f:
+            self.offsets = json.load(f)
+        stat = os.stat(index_path)
+        self.size = stat.st_size
+        self.etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.gzip_path = f"{index_path}.gz"
+        self.gzip_etag = f'{self.etag[:-1]}-gzip"'
+        self.rng = random.Random(seed)
+        self.mod_zips = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.failures = 0
+
+    def count(self, sent):
+        with self.lock:
+            self.bytes_sent += sent
+
+    def roll(self, rate):
+        with self.lock:
+            return self.rng.random() < rate
+
+    def gzip_size(self):
+        # Compressed once next to the index and reused as long as it is newer
+        with self.lock:
+            if not os.path.exists(self.gzip_path) or os.path.getmtime(self.gzip_path) < os.path.getmtime(self.index_path):
+                with open(self.index_path, "rb") as f, gzip.open(f"{self.gzip_path}.tmp", "wb", compresslevel=6) as out:
+                    while chunk := f.read(SEND_BUFFER_SIZE * 16):
+                        out.write(chunk)
+                os.replace(f"{self.gzip_path}.tmp", self.gzip_path)
+            return os.path.getsize(self.gzip_path)
+
+    def mod_zip(self, key):
+        # Incompressible and deterministic per release, so sizes and hashes are stable across runs
+        with self.lock:
+            if key not in self.mod_zips:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, "w") as archive:
+                    archive.writestr("manifest.json", json.dumps({"name": key}))
+                    archive.writestr("plugin.dll", random.Random(key).randbytes(MOD_ZIP_SIZE))
+                self.mod_zips[key] = buffer.getvalue()
+            return self.mod_zips[key]
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def send_body(self, status, body, headers=None, counted=True):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if counted:
+            self.state.count(len(body))
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path.startswith(STATS_PATH):
+            state = self.state
+            stats = {"requests": state.requests, "bytes_sent": state.bytes_sent, "failures": state.failures}
+            if path.endswith("/reset"):
+                state.reset()
+            return self.send_body(200, json.dumps(stats).encode(), {"Content-Type": "application/json"}, counted=False)
+
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.roll(self.state.fail_rate):
+            with self.state.lock:
+                self.state.failures += 1
+            return self.send_body(503, b"injected failure", {"Retry-After": f"{self.state.retry_after:g}"})
+
+        if path.startswith(PACKAGE_API_PREFIX):
+            return self.serve_package(path)
+        if path.startswith(DOWNLOAD_PATH):
+            return self.serve_download(path)
+        return self.serve_index()
+
+    def serve_package(self, path):
+        parts = path[len(PACKAGE_API_PREFIX):].strip("/").split("/")
+        location = self.state.offsets.get("-".join(parts[:2])) if len(parts) in (2, 4) else None
+        if location is None or (len(parts) == 4 and parts[3] != "changelog"):
+            return self.send_body(404, b'{"detail":"Not found."}', {"Content-Type": "application/json"})
+        with open(self.state.index_path, "rb") as f:
+            f.seek(location[0])
+            package = json.loads(f.read(location[1]))
+        versions = package.pop("versions")
+        if len(parts) == 4:
+            return self.serve_changelog(package, versions, parts[2])
+
+        package["latest"] = versions[0]
+        self.send_body(200, json.dumps(package).encode(), {"Content-Type": "application/json"})
+
+    def serve_changelog(self, package, versions, version):
+        # Every release up to the requested one, newest first, like a mod's CHANGELOG.md
+        numbers = [entry["version_number"] for entry in versions]
+        if version not in numbers:
+            return self.send_body(404, b'{"detail":"Not found."}', {"Content-Type": "application/json"})
+        sections = [f"## {number}\n\n- {package['name']} changes for {number}\n" for number in numbers[numbers.index(version):]]
+        markdown = f"# {package['name']}\n\n" + "\n".join(sections)
+        self.send_body(200, json.dumps({"markdown": markdown}).encode(), {"Content-Type": "application/json"})
+
+    def serve_download(self, path):
+        parts = path[len(DOWNLOAD_PATH):].strip("/").split("/")
+        if len(parts) != 3 or "-".join(parts[:2]) not in self.state.offsets:
+            return self.send_body(404, b"Not found", {"Content-Type": "text/plain"})
+        body = self.state.mod_zip("-".join(parts))
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.send_ranged(io.BytesIO(body), len(body), {"ETag": etag, "Content-Type": "application/zip"}, etag)
+
+    def serve_index(self):
+        state = self.state
+        # Like a CDN: the gzip representation has its own ETag and ranges apply to its compressed bytes
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        etag = state.gzip_etag if gzipped else state.etag
+        validators = {"ETag": etag, "Last-Modified": state.last_modified, "Vary": "Accept-Encoding"}
+        if self.headers.get("If-None-Match") in (state.etag, state.gzip_etag) or self.headers.get("If-Modified-Since") == state.last_modified:
+            return self.send_body(304, b"", validators)
+        headers = dict(validators, **{"Content-Type": "application/json"})
+        if gzipped:
+            size = state.gzip_size()
+            with open(state.gzip_path, "rb") as f:
+                self.send_ranged(f, size, dict(headers, **{"Content-Encoding": "gzip"}), etag)
+            return
+        with open(state.index_path, "rb") as f:
+            self.send_ranged(f, state.size, headers, etag)
+
+    def send_ranged(self, f, size, headers, etag):
+        state = self.state
+        start = 0
+        status = 200
+        headers = dict(headers, **{"Accept-Ranges": "bytes"})
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes=") and range_header.endswith("-") and self.headers.get("If-Range", etag) == etag:
+            start = min(int(range_header[len("bytes="):-1]), size)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+
+        length = size - start
+        # A dropped transfer stops somewhere in the body and closes the connection
+        drop_at = start + int(length * state.rng.random()) if state.roll(state.drop_rate) else None
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        f.seek(start)
+        position = start
+        while chunk := f.read(SEND_BUFFER_SIZE):
+            if drop_at is not None and position + len(chunk) > drop_at:
+                chunk = chunk[:drop_at - position]
+                self.wfile.write(chunk)
+                state.count(len(chunk))
+                with state.lock:
+                    state.failures += 1
+                self.close_connection = True
+                return
+            self.wfile.write(chunk)
+            state.count(len(chunk))
+            position += len(chunk)
+
+def start_server(index_path, port=0, **faults):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.daemon_threads = True
+    server.state = StandinState(index_path, **faults)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic Thunderstore index with optional fault injection")
+    parser.add_argument("--index", required=True, help="Index file written by synthetic_index.py")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of index transfers cut off midway")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds sent with the injected 503 answers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_server(args.index, args.port, latency=args.latency, fail_rate=args.fail_rate, drop_rate=args.drop_rate, retry_after=args.retry_after, seed=args.seed)
+    # The first line tells the parent process where to connect
+    print(f"PORT {server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import random
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+DEFAULT_SIZES = [1000, 10000, 100000, 500000]
+MANIFEST_SIZES = [10, 100, 500]
+
+WORDS = [
+    "Better", "More", "Extra", "Shop", "Cart", "Valuables", "Enemy", "Level", "Music", "Sound",
+    "Upgrade", "Drone", "Boombox", "Lib", "Config", "Menu", "Revive", "Sprint", "Map", "Vote",
+    "Flashlight", "Mimic", "Duck", "Gnome", "Nuke", "Retro", "Cannon", "Rifle", "Hospital", "Walkie"
+]
+
+def package_name(index):
+    owner = f"{WORDS[index % len(WORDS)]}Team{index // len(WORDS) % 5000}"
+    name = f"{WORDS[(index * 7) % len(WORDS)]}{WORDS[(index * 13) % len(WORDS)]}{index}"
+    return owner, name
+
+def make_package(index, seed=0):
+    # Deterministic per index, so manifests can be derived without reading the index back
+    rng = random.Random(seed * 1_000_003 + index)
+    owner, name = package_name(index)
+    full_name = f"{owner}-{name}"
+    version_count = rng.choice([1, 1, 2, 3, 5, 8, 20])
+    dependencies = ["BepInEx-BepInExPack-5.4.2100"]
+    for _ in range(rng.randint(0, 3)):
+        if index:
+            dep_owner, dep_name = package_name(rng.randrange(index))
+            dependencies.append(f"{dep_owner}-{dep_name}-1.0.0")
+    versions = []
+    for number in range(version_count, 0, -1):
+        version_number = f"1.{number // 10}.{number % 10}"
+        versions.append({
+            "name": name,
+            "full_name": f"{full_name}-{version_number}",
+            "description": f"{name} adds {rng.choice(WORDS).lower()} to the game.",
+            "icon": f"https://gcdn.thunderstore.io/live/repository/icons/{full_name}-{version_number}.png",
+            "version_number": version_number,
+            "dependencies": dependencies,
+            "download_url": f"https://thunderstore.io/package/download/{owner}/{name}/{version_number}/",
+            "downloads": rng.randint(0, 500000),
+            "date_created": f"2025-{1 + number % 12:02d}-{1 + number % 28:02d}T12:00:00.000000Z",
+            "website_url": "",
+            "is_active": True,
+            "uuid4": f"{index:08x}-0000-4000-8000-{number:012x}",
+            "file_size": rng.randint(10000, 50000000)
+        })
+    return {
+        "name": name,
+        "full_name": full_name,
+        "owner": owner,
+        "package_url": f"https://thunderstore.io/c/repo/p/{owner}/{name}/",
+        "donation_link": None,
+        "date_created": "2025-01-01T12:00:00.000000Z",
+        "date_updated": versions[0]["date_created"],
+        "uuid4": f"{index:08x}-0000-4000-8000-000000000000",
+        "rating_score": rng.randint(0, 500),
+        "is_pinned": False,
+        "is_deprecated": rng.random() < 0.02,
+        "has_nsfw_content": rng.random() < 0.01,
+        "categories": [rng.choice(["Mods", "Valuables", "Audio", "Levels", "Monsters"])],
+        "versions": versions
+    }
+
+def write_index(path, count, seed=0):
+    # Streams the index to disk and records where every package object starts and ends,
+    # so the stand-in server can answer per-package requests without parsing the file.
+    offsets = {}
+    with open(path, "wb") as f:
+        f.write(b"[")
+        for index in range(count):
+            if index:
+                f.write(b",")
+            package = make_package(index, seed)
+            encoded = json.dumps(package).encode("utf-8")
+            offsets[package["full_name"]] = (f.tell(), len(encoded))
+            f.write(encoded)
+        f.write(b"]")
+    with open(f"{path}.offsets.json", "w") as f:
+        json.dump(offsets, f)
+    return offsets
+
+def manifest_dependencies(index_size, manifest_size, seed=0):
+    # Spread across the index and pinned to the oldest release, so every entry has an update waiting
+    step = max(1, index_size // manifest_size)
+    dependencies = []
+    for index in range(0, index_size, step)[:manifest_size]:
+        package = make_package(index, seed)
+        dependencies.append(f"{package['full_name']}-{package['versions'][-1]['version_number']}")
+    return dependencies
+
+def ensure_index(count, data_dir=DATA_DIR, seed=0):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"index-{count}-{seed}.json")
+    if not (os.path.exists(path) and os.path.exists(f"{path}.offsets.json")):
+        write_index(path, count, seed)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Thunderstore package indexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Package counts to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DATA_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = ensure_index(size, args.out, args.seed)
+        print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import zipfile
+
+from modpack import MANIFEST_PATH, PACK_FILES
+from output_stage import file_digest
+
+THUNDERSTORE_TEAM = os.getenv("THUNDERSTORE_TEAM")
+BUILD_DIR = os.getenv("BUILD_DIR", "builds")
+BUILD_STATE_FILE = ".build-state.json"
+# Thunderstore rejects a package without these; the changelog is optional
+REQUIRED_FILES = (MANIFEST_PATH, "icon.png", "README.md")
+# Formats that are compressed already; deflating them again costs time and saves nothing
+STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip", ".gz", ".7z")
+COPY_BUFFER_SIZE = 256 * 1024
+# Bumped whenever the archive layout changes, so builds of an older layout are not reused
+BUILD_FORMAT = 1
+# The earliest date a zip can hold, used when SOURCE_DATE_EPOCH is not set
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+def build_date_time():
+    # Every entry gets the same timestamp, so the archive only depends on the content of its files
+    epoch = os.getenv("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return ZIP_EPOCH
+    return max(ZIP_EPOCH, time.gmtime(int(epoch))[:6])
+
+def pack_entries(directory=".", required=REQUIRED_FILES):
+    # (name in the archive, path on disk, deflate) for the pack files present, in PACK_FILES order
+    entries = []
+    for name in PACK_FILES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            entries.append((name, path, not name.lower().endswith(STORED_SUFFIXES)))
+        elif name in required:
+            raise FileNotFoundError(f"{path} is required to build the package")
+    return entries
+
+def zip_info(name, size, deflate, date_time):
+    info = zipfile.ZipInfo(name, date_time=date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    # Known up front so the entry only gets ZIP64 fields when it needs them
+    info.file_size = size
+    return info
+
+def write_zip(output, entries, date_time=None):
+    # Streams every file into the archive without reading it whole, then moves the archive into place
+    date_time = date_time or build_date_time()
+    tmp_path = f"{output}.tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as archive:
+            for name, path, deflate in entries:
+                info = zip_info(name, os.path.getsize(path), deflate, date_time)
+                with open(path, "rb") as source, archive.open(info, "w") as target:
+                    shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output
+
+def inputs_key(entries, date_time):
+    # Everything the archive is made of: the layout, the timestamp and the hash of every file
+    return {
+        "format": BUILD_FORMAT,
+        "date_time": list(date_time),
+        "files": [[name, deflate, file_digest(path).hex()] for name, path, deflate in entries],
+    }
+
+def load_build_state(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_build_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def default_output(manifest, build_dir=BUILD_DIR, namespace=THUNDERSTORE_TEAM):
+    name = f"{manifest.get('name', 'PackageName')}-{manifest.get('version_number', '1.0.0')}.zip"
+    return os.path.join(build_dir, f"{namespace}-{name}" if namespace else name)
+
+def build_package(directory=".", output=None, force=False):
+    # Returns (output, built); the archive is left alone when it was built from the same inputs last time
+    if output is None:
+        with open(os.path.join(directory, MANIFEST_PATH), "r") as f:
+            output = default_output(json.load(f))
+    entries = pack_entries(directory)
+    date_time = build_date_time()
+    key = inputs_key(entries, date_time)
+
+    build_dir = os.path.dirname(output) or "."
+    state_path = os.path.join(build_dir, BUILD_STATE_FILE)
+    state = load_build_state(state_path)
+    previous = state.get(os.path.basename(output))
+    if not force and previous and previous.get("inputs") == key:
+        # The archive itself is checked too, in case it was replaced or damaged since
+        digest = file_digest(output)
+        if digest is not None and digest.hex() == previous.get("sha256"):
+            return output, False
+
+    os.makedirs(build_dir, exist_ok=True)
+    write_zip(output, entries, date_time)
+    state[os.path.basename(output)] = {"inputs": key, "sha256": file_digest(output).hex()}
+    save_build_state(state_path, state)
+    return output, True
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Thunderstore package zip of a modpack")
+    parser.add_argument("--directory", default=".", help="Pack directory holding manifest.json, icon.png, README.md and CHANGELOG.md")
+    parser.add_argument("--output", help=f"Zip to write (default: {BUILD_DIR}/<team>-<name>-<version>.zip)")
+    parser.add_argument("--force", action="store_true", default=os.getenv("BUILD_FORCE", "false").lower() == "true", help="Rebuild even when the inputs did not change")
+    args = parser.parse_args()
+
+    try:
+        output, built = build_package(args.directory, args.output, force=args.force)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    if built:
+        print(f"{output} built ({os.path.getsize(output)} bytes).")
+    else:
+        print(f"{output} already up to date.")
+
+if __name__ == "__main__":
+    main()
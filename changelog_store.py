@@ -0,0 +1,65 @@
+import itertools
+import os
+import re
+import shutil
+
+CHANGELOG_PATH = "CHANGELOG.md"
+RELEASE_HEADING_RE = re.compile(r"^## v\S+ - (\d{4})-")
+COPY_BUFFER_SIZE = 64 * 1024
+
+def archive_path(path, year):
+    root, ext = os.path.splitext(path)
+    return f"{root}-{year}{ext}"
+
+def iter_lines(path):
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from f
+    except FileNotFoundError:
+        return
+
+def copy_into(path, out):
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as current:
+            shutil.copyfileobj(current, out, COPY_BUFFER_SIZE)
+    except FileNotFoundError:
+        pass
+
+def prepend_changelog(entry, output, path=CHANGELOG_PATH, max_bytes=0):
+    # Streams the new entry followed by the current file into the output stage. Once that grows past max_bytes,
+    # the newest releases up to half the limit stay in the hot file and the rest moves to per-year segments.
+    # Rolling down to half the limit means a release does not trigger a roll on every run.
+    # Returns the archive segments that receive older releases
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        size = 0
+    keep_bytes = max_bytes // 2 if max_bytes and size + len(entry.encode("utf-8")) > max_bytes else None
+
+    segments = {}
+    kept = 0
+    rolling = False
+    year = None
+    try:
+        with output.open(path, "w", encoding="utf-8", newline="") as hot:
+            for line in itertools.chain(entry.splitlines(keepends=True), iter_lines(path)):
+                match = RELEASE_HEADING_RE.match(line)
+                if match:
+                    year = match.group(1)
+                    # The newest release always stays, even when it is bigger than the budget on its own
+                    rolling = rolling or (keep_bytes is not None and kept > 0 and kept >= keep_bytes)
+                if rolling:
+                    segment = segments.get(year)
+                    if segment is None:
+                        segment = segments[year] = output.open(archive_path(path, year), "w", encoding="utf-8", newline="")
+                    segment.write(line)
+                else:
+                    hot.write(line)
+                    kept += len(line.encode("utf-8"))
+        # Releases rolled now are newer than anything already in the segment
+        for year, segment in segments.items():
+            copy_into(archive_path(path, year), segment)
+    finally:
+        for segment in segments.values():
+            segment.close()
+    return [archive_path(path, year) for year in sorted(segments, reverse=True)]
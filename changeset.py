@@ -0,0 +1,138 @@
+from dependency_graph import parse_version
+
+def parse_dependency(dependency):
+    # "namespace-name-1.2.3" -> ("namespace-name", "1.2.3"), None unless it has exactly those three parts
+    parts = dependency.split("-")
+    if len(parts) != 3:
+        return None
+    return f"{parts[0]}-{parts[1]}", parts[2]
+
+SNAPSHOT_FORMAT = 2
+
+def snapshot_entries(raw):
+    # {"format": 2, "index": generation, "dependencies": {"namespace-name": {"version", "date_updated", "package_url", "digest"}}}.
+    # The first format was a bare list of "namespace-name-version" strings; its entries carry no digest,
+    # so they are evaluated once more and rewritten in the current format
+    if isinstance(raw, dict):
+        return dict(raw.get("dependencies", {}))
+    entries = {}
+    for dependency in raw or ():
+        parsed = parse_dependency(dependency)
+        if parsed is not None:
+            entries[parsed[0]] = {"version": parsed[1]}
+    return entries
+
+def snapshot_generation(raw):
+    # The index generation every entry was last checked against; the delta from there names what may have moved since
+    return raw.get("index") if isinstance(raw, dict) else None
+
+def snapshot_record(version, package, constraint=None):
+    # What the next run compares against to tell whether the package needs evaluating again
+    record = {
+        "version": version,
+        "date_updated": package.get("date_updated", ""),
+        "package_url": package.get("package_url", ""),
+        "digest": package.get("digest", "")
+    }
+    if constraint is not None:
+        record["constraint"] = str(constraint)
+    return record
+
+def merge_dependencies(dependencies, resolved):
+    # Keeps the manifest order for known packages; adding a package never downgrades its entry
+    current = {}
+    for dep in dependencies:
+        parsed = parse_dependency(dep)
+        if parsed:
+            current[parsed[0]] = parsed[1]
+    added = []
+    upgraded = []
+    for full_name, version in resolved.items():
+        if full_name not in current:
+            added.append(f"{full_name}-{version}")
+        elif is_newer(version, current[full_name]):
+            upgraded.append((full_name, current[full_name], version))
+    replaced = {f"{full_name}-{old}": f"{full_name}-{new}" for full_name, old, new in upgraded}
+    merged = [replaced.get(dep, dep) for dep in dependencies] + added
+    return merged, added, upgraded
+
+class ModChange:
+    __slots__ = ("full_name", "old_version", "new_version", "package_url")
+
+    def __init__(self, full_name, old_version, new_version, package_url=None):
+        self.full_name = full_name
+        self.old_version = old_version
+        self.new_version = new_version
+        self.package_url = package_url
+
+    @property
+    def dependency(self):
+        return f"{self.full_name}-{self.new_version}"
+
+    @property
+    def is_update(self):
+        return self.old_version is not None and self.new_version is not None and self.old_version != self.new_version
+
+    def __repr__(self):
+        return f"ModChange({self.full_name!r}, {self.old_version!r}, {self.new_version!r})"
+
+class ChangeSet:
+    # Built in one pass over the manifest: every entry is recorded once, keyed by namespace-name,
+    # then finish() diffs the names against the snapshot to find what was added and removed.
+    __slots__ = ("entries", "malformed", "missing", "snapshot", "records", "next_snapshot", "added", "updated", "removed")
+
+    def __init__(self, snapshot=None):
+        self.entries = []
+        self.malformed = []
+        self.missing = []
+        # snapshot_entries() of the last run, and the records of this one keyed the same way
+        self.snapshot = snapshot or {}
+        self.records = {}
+        self.next_snapshot = {}
+        self.added = []
+        self.updated = []
+        self.removed = []
+
+    def keep(self, full_name, current_version, package_url=None):
+        self.entries.append(ModChange(full_name, current_version, current_version, package_url))
+
+    def update(self, full_name, current_version, latest_version, package_url=None):
+        self.entries.append(ModChange(full_name, current_version, latest_version, package_url))
+
+    def add_malformed(self, dependency):
+        self.malformed.append(dependency)
+
+    def finish(self, thunderstore_lookup):
+        names = {entry.full_name for entry in self.entries}
+        self.added = sorted((entry for entry in self.entries if entry.full_name not in self.snapshot), key=lambda entry: entry.full_name)
+        self.updated = sorted((entry for entry in self.entries if entry.is_update and entry.full_name in self.snapshot), key=lambda entry: entry.full_name)
+        self.removed = []
+        for full_name in sorted(self.snapshot.keys() - names):
+            package_url = self.snapshot[full_name].get("package_url")
+            if not package_url:
+                package = thunderstore_lookup.get(full_name)
+                package_url = package.get("package_url") if package else None
+            self.removed.append(ModChange(full_name, self.snapshot[full_name]["version"], None, package_url))
+        # Entries without a record (missing packages, added closure) have no digest and are evaluated again next run
+        self.next_snapshot = {}
+        for entry in sorted(self.entries, key=lambda entry: entry.full_name):
+            self.next_snapshot[entry.full_name] = self.records.get(entry.full_name) or {"version": entry.new_version, "package_url": entry.package_url or ""}
+        return self
+
+    @property
+    def dependencies(self):
+        return [entry.dependency for entry in self.entries] + self.malformed
+
+    @property
+    def has_updates(self):
+        return any(entry.is_update for entry in self.entries)
+
+    @property
+    def names_changed(self):
+        return bool(self.added or self.removed)
+
+    def __bool__(self):
+        return self.has_updates or self.names_changed
+
+def is_newer(latest_version, current_version):
+    return parse_version(latest_version) > parse_version(current_version)
@@ -0,0 +1,88 @@
+import json
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from dependency_graph import parse_version
+
+def parse_constraint(text):
+    # A bare version is an exact pin, anything else is a PEP 440 specifier set such as "~=1.4" or ">=1.2,<2"
+    text = text.strip()
+    if text and text[0].isdigit():
+        text = f"=={text}"
+    return SpecifierSet(text)
+
+def load_constraints(path):
+    # {"namespace-name": "~=1.4", ...}; a missing file means no constraints
+    try:
+        with open(path, "r") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path} must map package names to version constraints")
+    return raw
+
+def parse_constraints(raw, path="constraints"):
+    constraints = {}
+    for full_name, text in raw.items():
+        try:
+            constraints[full_name] = parse_constraint(str(text))
+        except InvalidSpecifier:
+            raise ValueError(f"Invalid constraint for {full_name} in {path}: {text}")
+    return constraints
+
+def sort_versions(version_numbers):
+    # Done once per package when the index is scanned; releases that are not valid versions are dropped
+    parsed = []
+    for number in version_numbers:
+        try:
+            parsed.append((Version(number), number))
+        except InvalidVersion:
+            continue
+    parsed.sort()
+    return [number for _, number in parsed]
+
+@lru_cache(maxsize=4096)
+def version_index(versions):
+    # "1.0.0 1.0.1 1.1.0", ascending as stored in the index, parsed once per run
+    numbers = versions.split()
+    return numbers, [parse_version(number) for number in numbers]
+
+def next_release(release):
+    # ~=1.4 allows up to 2, ~=1.4.2 up to 1.5
+    prefix = list(release[:-1]) or [release[0]]
+    prefix[-1] += 1
+    return Version(".".join(map(str, prefix)))
+
+def specifier_bounds(specifiers, parsed):
+    # Narrow the sorted releases to [lo, hi) by bisection on the bounded operators;
+    # the remaining few are checked against the full specifier set
+    lo, hi = 0, len(parsed)
+    for specifier in specifiers:
+        operator = specifier.operator
+        if specifier.version.endswith(".*") or operator in ("!=", "==="):
+            continue
+        bound = Version(specifier.version)
+        if operator in ("<", "<="):
+            hi = min(hi, (bisect_left if operator == "<" else bisect_right)(parsed, bound))
+        elif operator in (">", ">="):
+            lo = max(lo, (bisect_right if operator == ">" else bisect_left)(parsed, bound))
+        elif operator == "==":
+            lo = max(lo, bisect_left(parsed, bound))
+            hi = min(hi, bisect_right(parsed, bound))
+        elif operator == "~=":
+            lo = max(lo, bisect_left(parsed, bound))
+            hi = min(hi, bisect_left(parsed, next_release(bound.release)))
+    return lo, hi
+
+def best_version(versions, specifiers):
+    # Highest release allowed by the specifiers, None when none is
+    numbers, parsed = version_index(versions)
+    lo, hi = specifier_bounds(specifiers, parsed)
+    for i in range(hi - 1, lo - 1, -1):
+        if specifiers.contains(parsed[i], prereleases=True):
+            return numbers[i]
+    return None
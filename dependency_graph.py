@@ -0,0 +1,155 @@
+from array import array
+from functools import lru_cache
+from packaging import version
+
+# Enough to point at the problem; a badly tangled community graph would otherwise report thousands
+MAX_REPORTED_CYCLES = 20
+
+@lru_cache(maxsize=None)
+def parse_version(value):
+    return version.parse(value)
+
+def split_dependency(dependency):
+    # "namespace-name-1.2.3" -> ("namespace-name", "1.2.3"), None when malformed
+    full_name, separator, dependency_version = dependency.rpartition("-")
+    if not separator or "-" not in full_name:
+        return None
+    return full_name, dependency_version
+
+class DependencyGraph:
+    # Packages are numbered once, edges live in flat CSR arrays: the edges of node i are
+    # targets[offsets[i]:offsets[i + 1]], each with the minimum version in required[].
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.versions = []
+        self.offsets = array("I", [0])
+        self.targets = array("I")
+        self.required = []
+
+    def _node(self, name):
+        node = self.ids.get(name)
+        if node is None:
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.versions.append(None)
+        return node
+
+    @classmethod
+    def from_lookup(cls, lookup):
+        graph = cls()
+        dependency_lists = []
+        for name, package in lookup.items():
+            graph.versions[graph._node(name)] = package.get("version")
+            dependency_lists.append(package.get("dependencies", ""))
+
+        # Known packages got the first ids, so their edge lists can be appended in node order
+        for dependencies in dependency_lists:
+            for dependency in dependencies.split():
+                parsed = split_dependency(dependency)
+                if parsed is None:
+                    continue
+                graph.targets.append(graph._node(parsed[0]))
+                graph.required.append(parsed[1])
+            graph.offsets.append(len(graph.targets))
+        # Packages only seen as a dependency target are not on Thunderstore and have no edges
+        while len(graph.offsets) <= len(graph.names):
+            graph.offsets.append(len(graph.targets))
+        return graph
+
+    def __len__(self):
+        return len(self.names)
+
+    def latest_version(self, name):
+        node = self.ids.get(name)
+        return None if node is None else self.versions[node]
+
+    def traverse(self, roots):
+        # Iterative depth-first walk from the root ids. Every node is expanded once, so shared
+        # subtrees are not walked again. Returns dependencies-first order, requirements per node
+        # as (dependent id, minimum version) pairs, and the cycles met on the way. A root id past the
+        # last node stands for a package the graph does not know: it has no edges and nothing requires it.
+        WHITE, GRAY, BLACK = 0, 1, 2
+        state = bytearray(len(self.names))
+        order = []
+        requirements = {}
+        cycles = []
+        for root in roots:
+            if root >= len(self.names):
+                order.append(root)
+                continue
+            if state[root] != WHITE:
+                continue
+            state[root] = GRAY
+            stack = [[root, self.offsets[root]]]
+            while stack:
+                frame = stack[-1]
+                node, edge = frame
+                if edge < self.offsets[node + 1]:
+                    frame[1] += 1
+                    target = self.targets[edge]
+                    requirements.setdefault(target, []).append((node, self.required[edge]))
+                    if state[target] == WHITE:
+                        state[target] = GRAY
+                        stack.append([target, self.offsets[target]])
+                    elif state[target] == GRAY and len(cycles) < MAX_REPORTED_CYCLES:
+                        path = [entry[0] for entry in stack]
+                        cycles.append([self.names[n] for n in path[path.index(target):]] + [self.names[target]])
+                else:
+                    state[node] = BLACK
+                    order.append(node)
+                    stack.pop()
+        return order, requirements, cycles
+
+class ResolutionReport:
+    def __init__(self):
+        self.order = []
+        self.duplicates = {}
+        self.unlisted = {}
+        self.unknown = {}
+        self.conflicts = []
+        self.cycles = []
+
+def resolve_dependencies(graph, dependencies):
+    report = ResolutionReport()
+    shipped = {}
+    for dependency in dependencies:
+        parsed = split_dependency(dependency)
+        if parsed is None:
+            continue
+        name, dependency_version = parsed
+        if name in shipped and shipped[name] != dependency_version:
+            report.duplicates.setdefault(name, [shipped[name]]).append(dependency_version)
+        shipped[name] = dependency_version
+
+    # Roots that are not on Thunderstore are numbered after the graph's nodes in a list of this call:
+    # the graph is shared by the packs resolved in parallel and is never changed here
+    known = len(graph.names)
+    extra = []
+    roots = []
+    for name in shipped:
+        node = graph.ids.get(name)
+        if node is None:
+            node = known + len(extra)
+            extra.append(name)
+        roots.append(node)
+
+    order, requirements, report.cycles = graph.traverse(roots)
+    report.order = [graph.names[node] if node < known else extra[node - known] for node in order]
+
+    for node in order:
+        required_by = requirements.get(node)
+        if not required_by:
+            continue
+        name = graph.names[node]
+        dependents = {graph.names[dependent] for dependent, _ in required_by}
+        if graph.versions[node] is None:
+            report.unknown[name] = dependents
+            continue
+        if name not in shipped:
+            report.unlisted[name] = dependents
+        provided = parse_version(shipped.get(name, graph.versions[node]))
+        dependent, required = max(required_by, key=lambda requirement: parse_version(requirement[1]))
+        if provided < parse_version(required):
+            report.conflicts.append((name, shipped.get(name, graph.versions[node]), required, graph.names[dependent]))
+    return report
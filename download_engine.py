@@ -0,0 +1,173 @@
+import os
+import random
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+
+import requests
+from urllib3.exceptions import HTTPError as TransportError
+
+try:
+    import brotli # type: ignore
+except ImportError:
+    brotli = None
+
+# Answers worth retrying; anything else is returned to the caller as is
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_BACKOFF = float(os.getenv("THUNDERSTORE_MAX_BACKOFF", 60))
+ACCEPT_ENCODING = "br, gzip" if brotli else "gzip"
+
+class DownloadError(Exception):
+    # The retries or the deadline ran out; the last failure is chained as __cause__
+    pass
+
+def parse_retry_after(value):
+    # Seconds, or an HTTP date; None when absent or unreadable
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    # Exponential backoff with equal jitter, capped at max_delay, all within one deadline for the whole download
+    def __init__(self, max_retries, base_delay, deadline=None, max_delay=MAX_BACKOFF, warn=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_at = time.monotonic() + deadline if deadline else None
+        self.warn = warn
+
+    def backoff(self, attempt):
+        bound = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return bound / 2 + random.uniform(0, bound / 2)
+
+    def wait(self, attempt, error, retry_after=None):
+        # Sleeps before attempt + 1, or raises DownloadError when there is none left
+        if attempt >= self.max_retries:
+            raise DownloadError(f"giving up after {attempt} attempts: {error}") from error
+        delay = self.backoff(attempt) if retry_after is None else min(retry_after, self.max_delay)
+        if self.deadline_at is not None and time.monotonic() + delay > self.deadline_at:
+            raise DownloadError(f"deadline reached after {attempt} attempts: {error}") from error
+        if self.warn:
+            self.warn(f"Attempt {attempt} failed: {error}. Retrying in {delay:.1f} seconds...")
+        time.sleep(delay)
+
+class BodyDecoder:
+    # Undoes the Content-Encoding incrementally, so it can be fed the raw bytes of several resumed responses
+    def __init__(self, content_encoding):
+        encoding = (content_encoding or "identity").strip().lower()
+        self.flush = None
+        if encoding in ("gzip", "x-gzip"):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.decode, self.flush = decompressor.decompress, decompressor.flush
+        elif encoding == "deflate":
+            decompressor = zlib.decompressobj()
+            self.decode, self.flush = decompressor.decompress, decompressor.flush
+        elif encoding == "br" and brotli is not None:
+            self.decode = brotli.Decompressor().process
+        elif encoding == "identity":
+            self.decode = bytes
+        else:
+            raise ValueError(f"unsupported Content-Encoding: {content_encoding}")
+
+class ResumableDownload:
+    # One GET whose body survives dropped connections. The bytes are read still encoded and counted as they come
+    # off the wire, so a retry asks for the rest with Range/If-Range and the decoder carries on as if nothing
+    # happened. When the server cannot resume, iter_content raises requests.ConnectionError and the caller
+    # has to start over.
+    def __init__(self, session, url, headers, timeout, policy, count_bytes=None):
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.policy = policy
+        self.count_bytes = count_bytes
+        self.request_headers = dict(headers, **{"Accept-Encoding": ACCEPT_ENCODING})
+        self.response = self.get(self.request_headers)
+        self.status_code = self.response.status_code
+        self.headers = self.response.headers
+
+    def get(self, headers):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                resp = self.session.get(self.url, headers=headers, timeout=self.timeout, stream=True)
+            except requests.RequestException as e:
+                self.policy.wait(attempt, e)
+                continue
+            if resp.status_code not in RETRY_STATUSES:
+                return resp
+            error = requests.HTTPError(f"{resp.status_code} {resp.reason} for {self.url}", response=resp)
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            resp.close()
+            self.policy.wait(attempt, error, retry_after)
+
+    def resume(self, received):
+        # Only the exact same representation can be continued, anything else means starting over
+        validator = self.headers.get("ETag") or self.headers.get("Last-Modified")
+        if not validator:
+            raise requests.ConnectionError(f"{self.url} cannot be resumed without an ETag or Last-Modified")
+        headers = {name: value for name, value in self.request_headers.items() if name not in ("If-None-Match", "If-Modified-Since")}
+        headers.update({"Range": f"bytes={received}-", "If-Range": validator})
+        resp = self.get(headers)
+        resumed = (
+            resp.status_code == 206
+            and resp.headers.get("Content-Range", "").startswith(f"bytes {received}-")
+            and resp.headers.get("Content-Encoding") == self.headers.get("Content-Encoding")
+        )
+        if not resumed:
+            resp.close()
+            raise requests.ConnectionError(f"{self.url} changed or ignored the Range request, restarting")
+        return resp
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+    def iter_content(self, chunk_size):
+        self.raise_for_status()
+        decoder = BodyDecoder(self.headers.get("Content-Encoding"))
+        length = self.headers.get("Content-Length")
+        total = int(length) if length is not None else None
+        resp = self.response
+        received = 0
+        failures = 0
+        try:
+            while True:
+                progress = received
+                try:
+                    for chunk in resp.raw.stream(chunk_size, decode_content=False):
+                        received += len(chunk)
+                        if self.count_bytes:
+                            self.count_bytes(len(chunk))
+                        data = decoder.decode(chunk)
+                        if data:
+                            yield data
+                    if total is not None and received < total:
+                        raise requests.ConnectionError(f"Transfer of {self.url} ended after {received} of {total} bytes")
+                    break
+                except (requests.RequestException, TransportError, OSError) as e:
+                    resp.close()
+                    # A transfer that moved forward does not use up an attempt, the deadline still bounds it
+                    failures = 1 if received > progress else failures + 1
+                    self.policy.wait(failures, e)
+                    resp = self.resume(received)
+            tail = decoder.flush() if decoder.flush else b""
+            if tail:
+                yield tail
+        finally:
+            resp.close()
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -2,6 +2,8 @@ import json
 import toml # type: ignore
 import os
 
+from output_stage import commit_files
+
 THUNDERSTORE_TEAM = os.getenv("THUNDERSTORE_TEAM")
 
 MANIFEST_PATH = "manifest.json"
@@ -11,26 +13,20 @@ def load_manifest(path):
     with open(path, 'r') as f:
         return json.load(f)
 
-def save_thunderstore_toml(path, data):
-    with open(path, 'w') as f:
-        toml.dump(data, f)
-
-def main():
-    manifest = load_manifest(MANIFEST_PATH)
-    
+def build_thunderstore_config(manifest, namespace=THUNDERSTORE_TEAM, warn=print):
     dependencies = manifest.get("dependencies", [])
     deps = {}
 
     for dep in dependencies:
         try:
-            namespace, name, version = dep.split("-")
-            deps[f"{namespace}-{name}"] = f"{version}"  # Always latest compatible
+            namespace_part, name, version = dep.split("-")
+            deps[f"{namespace_part}-{name}"] = f"{version}"  # Always latest compatible
         except ValueError:
-            print(f"Skipping malformed dependency: {dep}")
+            warn(f"Skipping malformed dependency: {dep}")
             continue
-    
+
     package = {
-        "namespace": THUNDERSTORE_TEAM,
+        "namespace": namespace,
         "name": manifest.get("name", "PackageName"),
         "versionNumber": manifest.get("version_number", "1.0.0"),
         "description": manifest.get("description", "No description provided."),
@@ -56,15 +52,26 @@ def main():
         "copy": [{ "source": "./", "target": "" }]
     }
 
-    thunderstore_data = {
+    return {
         "config": config,
         "package": package,
         "publish": publish,
         "build": build
     }
 
-    save_thunderstore_toml(THUNDERSTORE_TOML_PATH, thunderstore_data)
-    print("thunderstore.toml updated.")
+def render_thunderstore_toml(manifest, namespace=THUNDERSTORE_TEAM, warn=print):
+    return toml.dumps(build_thunderstore_config(manifest, namespace=namespace, warn=warn))
+
+def write_thunderstore_toml(manifest, path=THUNDERSTORE_TOML_PATH, namespace=THUNDERSTORE_TEAM, dry_run=False, warn=print):
+    # Returns whether the rendered file differs from the one on disk; only then is it written
+    return bool(commit_files({path: render_thunderstore_toml(manifest, namespace=namespace, warn=warn)}, dry_run=dry_run))
+
+def main():
+    manifest = load_manifest(MANIFEST_PATH)
+    if write_thunderstore_toml(manifest):
+        print("thunderstore.toml updated.")
+    else:
+        print("thunderstore.toml already up to date.")
 
 if __name__ == "__main__":
     main()
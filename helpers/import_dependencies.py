@@ -0,0 +1,180 @@
+import argparse
+import base64
+import io
+import itertools
+import os
+import re
+import sys
+import zipfile
+
+import requests
+from colorama import init
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import update_dependencies as updater
+from changeset import is_newer, merge_dependencies
+from index_store import INDEX_CACHE_DIR
+
+THUNDERSTORE_PROFILE_API = os.getenv(
+    "THUNDERSTORE_PROFILE_API",
+    "https://thunderstore.io/api/experimental/legacyprofile/get/"
+)
+PROFILE_PREFIX = "#r2modman"
+PROFILE_EXPORT_FILE = "export.r2x"
+# .../p/<namespace>/<name>/ or the older .../package/<namespace>/<name>/, optionally followed by v/<version>/
+PACKAGE_URL_RE = re.compile(r"/(?:p|package)/([^/]+)/([^/]+)(?:/v/([^/]+))?/?$")
+VERSION_RE = re.compile(r"^\d+\.\d+\.\d+$")
+
+def load_yaml(stream):
+    try:
+        import yaml # type: ignore
+    except ImportError:
+        updater.log_error("❌ Reading mods.yml files and profiles needs PyYAML: pip install pyyaml")
+        sys.exit(1)
+    return yaml.safe_load(stream)
+
+def iter_url_entries(lines, source):
+    # Thunderstore URLs or plain "namespace-name" / "namespace-name-1.2.3" lines; # starts a comment
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        match = PACKAGE_URL_RE.search(line.split("?", 1)[0])
+        if match:
+            yield f"{match.group(1)}-{match.group(2)}", match.group(3), source
+            continue
+        parts = line.split("-")
+        if len(parts) == 3 and VERSION_RE.match(parts[2]):
+            yield f"{parts[0]}-{parts[1]}", parts[2], source
+        elif len(parts) == 2 and all(parts):
+            yield line, None, source
+        else:
+            updater.log_warning(f"Skipping unrecognized entry in {source}: {line}")
+
+def iter_mod_entries(mods, source):
+    # r2modman mods.yml entries carry versionNumber, profile exports carry version
+    for mod in mods or []:
+        if not mod.get("enabled", True) or not mod.get("name"):
+            continue
+        version = mod.get("versionNumber") or mod.get("version") or {}
+        pinned = f"{version.get('major', 0)}.{version.get('minor', 0)}.{version.get('patch', 0)}" if version else None
+        yield mod["name"], pinned, source
+
+def iter_profile_archive(data, source):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        export = load_yaml(archive.read(PROFILE_EXPORT_FILE))
+    yield from iter_mod_entries(export.get("mods"), source)
+
+def iter_profile_code(code, timeout_time):
+    resp = requests.get(f"{THUNDERSTORE_PROFILE_API}{code}/", headers={"User-Agent": updater.USER_AGENT}, timeout=timeout_time)
+    resp.raise_for_status()
+    payload = resp.text
+    if not payload.startswith(PROFILE_PREFIX):
+        raise ValueError(f"Profile {code} is not an r2modman profile")
+    yield from iter_profile_archive(base64.b64decode(payload[len(PROFILE_PREFIX):].strip()), f"profile {code}")
+
+def iter_source(path):
+    if path == "-":
+        yield from iter_url_entries(sys.stdin, "stdin")
+    elif path.endswith((".yml", ".yaml")):
+        with open(path, "r") as f:
+            yield from iter_mod_entries(load_yaml(f), path)
+    elif path.endswith(".r2z"):
+        with open(path, "rb") as f:
+            yield from iter_profile_archive(f.read(), path)
+    else:
+        with open(path, "r") as f:
+            yield from iter_url_entries(f, path)
+
+def collect_entries(entries):
+    # One entry per package with every version it was pinned to; None when any source asks for the latest
+    requested = {}
+    for full_name, pinned, source in entries:
+        if full_name in requested and requested[full_name] is None:
+            continue
+        if pinned is None:
+            requested[full_name] = None
+        else:
+            requested.setdefault(full_name, set()).add(pinned)
+    return requested
+
+def resolve_version(full_name, pins, package, latest=False):
+    # The highest pin that is a real release of the package, the latest release when there is none
+    if pins is None or latest:
+        return package["version"]
+    releases = set(package.get("versions", "").split())
+    real = [pinned for pinned in pins if pinned in releases]
+    for pinned in sorted(pins - releases):
+        updater.log_warning(f"{full_name} {pinned} is not a release on Thunderstore, ignoring the pin")
+    if not real:
+        updater.log_warning(f"No usable pin for {full_name}, using the latest {package['version']}")
+        return package["version"]
+    version = real[0]
+    for pinned in real[1:]:
+        if is_newer(pinned, version):
+            version = pinned
+    return version
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import mods from URL lists, r2modman mods.yml files, profile exports or profile codes into the manifest")
+    parser.add_argument("sources", nargs="*", help="URL or name lists (one per line, '-' for stdin), mods.yml files or .r2z profile exports")
+    parser.add_argument("--profile", action="append", default=[], help="Thunderstore profile code to import (repeatable)")
+    parser.add_argument("--manifest", default=updater.MANIFEST_PATH, help="Manifest to merge the dependencies into")
+    parser.add_argument("--latest", action="store_true", help="Use the latest release even when a source pins a version")
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes without writing the manifest")
+    parser.add_argument("--verbose", action="store_true", help="More verbose output")
+    parser.add_argument("--fetch-strategy", choices=["auto", "index", "targeted"], default=os.getenv("THUNDERSTORE_FETCH_STRATEGY", "auto"), help="Download the whole community index, query only the imported packages, or pick automatically")
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("THUNDERSTORE_MAX_CONCURRENCY", 8)), help="Max parallel requests when querying packages one by one")
+    parser.add_argument("--max-retries", type=int, default=int(os.getenv("THUNDERSTORE_MAX_RETRIES", 3)), help="Max retries for Thunderstore API requests")
+    parser.add_argument("--retry-delay", type=float, default=float(os.getenv("THUNDERSTORE_RETRY_DELAY", 2)), help="Base delay before retrying a Thunderstore request, doubled after every failed attempt (seconds)")
+    parser.add_argument("--timeout-time", type=int, default=int(os.getenv("THUNDERSTORE_TIMEOUT_TIME", 10)), help="Timeout for Thunderstore API requests (seconds)")
+    parser.add_argument("--fetch-deadline", type=float, default=float(os.getenv("THUNDERSTORE_FETCH_DEADLINE", 300)), help="Stop retrying Thunderstore once a fetch has taken this long, retries included (seconds, 0 for no limit)")
+    parser.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="Directory holding the cached Thunderstore index")
+    parser.add_argument("--cache-ttl", type=int, default=int(os.getenv("THUNDERSTORE_CACHE_TTL", 300)), help="Use the cached Thunderstore index without revalidating it for this many seconds")
+    parser.add_argument("--no-cache", action="store_true", help="Always download the Thunderstore index and do not cache it")
+    parser.add_argument("--offline", action="store_true", help="Only use the cached Thunderstore index, never hit the network")
+    args = parser.parse_args()
+    if not args.sources and not args.profile:
+        parser.error("nothing to import: give at least one source or --profile")
+    return args
+
+def main():
+    init(autoreset=True)
+    args = parse_args()
+
+    sources = [iter_source(path) for path in args.sources]
+    sources += [iter_profile_code(code, args.timeout_time) for code in args.profile]
+    try:
+        requested = collect_entries(itertools.chain.from_iterable(sources))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile, requests.RequestException) as e:
+        updater.log_error(f"❌ Could not read the import sources: {e}")
+        sys.exit(1)
+    updater.log_info(f"{len(requested)} packages to import.")
+
+    # Every entry is resolved in one batch, against the cached index when it is fresh enough.
+    # Pins are checked against every release of the package, which only the full index lists
+    cache_dir = None if args.no_cache else args.cache_dir
+    any_pins = not args.latest and any(pins is not None for pins in requested.values())
+    lookup = updater.load_thunderstore_lookup(args, set(requested), cache_dir, needs_index=any_pins)
+
+    resolved = {}
+    for full_name, pins in requested.items():
+        package = lookup.get(full_name)
+        if package is None:
+            updater.log_warning(f"Not on Thunderstore, skipped: {full_name}")
+            continue
+        resolved[full_name] = resolve_version(full_name, pins, package, latest=args.latest)
+
+    manifest = updater.load_manifest(args.manifest) if os.path.exists(args.manifest) else {}
+    merged, added, upgraded = merge_dependencies(manifest.get("dependencies", []), resolved)
+    for dep in added:
+        updater.log_info(f"Adding {dep}")
+    for full_name, old, new in upgraded:
+        updater.log_info(f"Upgrading {full_name} {old} → {new}")
+    if added or upgraded:
+        manifest["dependencies"] = merged
+        updater.save_manifest(args.manifest, manifest, dry_run=args.dry_run)
+    updater.log_info(f"Imported {len(resolved)} packages: {len(added)} added, {len(upgraded)} upgraded, {len(resolved) - len(added) - len(upgraded)} already present, {len(requested) - len(resolved)} not found.")
+
+if __name__ == "__main__":
+    main()
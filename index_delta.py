@@ -0,0 +1,116 @@
+import calendar
+import hashlib
+import json
+import os
+import time
+
+INDEX_DELTA_FILE = "delta.json"
+# Only these columns of the index store are compared: together they are the compact digest table of the community
+DELTA_COLUMNS = ("version", "date_updated", "digest", "deprecated")
+
+class IndexDelta:
+    # What changed between two downloads of the index, named by generation: a hash of the digest table they held.
+    # "changed" lists the packages whose entry moved without a new release, e.g. a new description
+    __slots__ = ("base", "generation", "created_at", "new", "updated", "deprecated", "removed", "changed")
+
+    def __init__(self, base, generation, created_at=None, new=None, updated=None, deprecated=None, removed=None, changed=None):
+        self.base = base
+        self.generation = generation
+        self.created_at = created_at if created_at is not None else time.time()
+        self.new = new or []
+        self.updated = updated or []
+        self.deprecated = deprecated or []
+        self.removed = removed or []
+        self.changed = changed or []
+
+    @property
+    def names(self):
+        return {entry["name"] for entry in self.new + self.updated + self.deprecated + self.removed + self.changed}
+
+    def changed_since(self, generation):
+        # Packages that may differ from what the given generation held; None when this delta does not reach that far back
+        if generation is None:
+            return None
+        if generation == self.generation:
+            return set()
+        if generation == self.base:
+            return self.names
+        return None
+
+    def to_dict(self):
+        return {
+            "from": self.base,
+            "to": self.generation,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.created_at)),
+            "new": self.new,
+            "updated": self.updated,
+            "deprecated": self.deprecated,
+            "removed": self.removed,
+            "changed": self.changed
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        created_at = calendar.timegm(time.strptime(raw["created_at"], "%Y-%m-%dT%H:%M:%SZ"))
+        return cls(raw["from"], raw["to"], created_at, raw["new"], raw["updated"], raw["deprecated"], raw["removed"], raw["changed"])
+
+    def __bool__(self):
+        return bool(self.new or self.updated or self.deprecated or self.removed or self.changed)
+
+class IndexDeltaBuilder:
+    # Fed every package of a download as it streams past, each with its row in the previous store, if any.
+    # Without a previous store there is nothing to compare and only the generation is worked out
+    def __init__(self, columns, base=None, compare=True):
+        self.positions = [columns.index(column) for column in DELTA_COLUMNS]
+        self.compare = compare
+        self.generation = hashlib.sha1()
+        self.delta = IndexDelta(base if compare else None, None)
+
+    def add(self, name, record, old=None):
+        version, date_updated, digest, deprecated = (record[i] for i in self.positions)
+        self.generation.update(f"{name}\0{digest}\0{deprecated}\n".encode("utf-8"))
+        if not self.compare:
+            return
+        if old is None:
+            self.delta.new.append({"name": name, "version": version, "date_updated": date_updated})
+            return
+        old_version, _, old_digest, old_deprecated = (old[i] for i in self.positions)
+        if old_version != version:
+            self.delta.updated.append({"name": name, "old_version": old_version, "new_version": version, "date_updated": date_updated})
+        elif deprecated and not old_deprecated:
+            self.delta.deprecated.append({"name": name, "version": version})
+        elif old_digest != digest or old_deprecated != deprecated:
+            self.delta.changed.append({"name": name, "version": version, "date_updated": date_updated})
+
+    def remove(self, name, version):
+        if self.compare:
+            self.delta.removed.append({"name": name, "version": version})
+
+    def finish(self):
+        self.delta.generation = self.generation.hexdigest()
+        return self.delta
+
+def save_index_delta(cache_dir, delta):
+    path = os.path.join(cache_dir, INDEX_DELTA_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(delta.to_dict(), f, indent=4)
+    os.replace(tmp_path, path)
+
+def load_index_delta(cache_dir, generation):
+    # The delta leading to the given generation, None when the cache holds none or one for another copy of the index
+    try:
+        with open(os.path.join(cache_dir, INDEX_DELTA_FILE), "r") as f:
+            delta = IndexDelta.from_dict(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+    return delta if generation is not None and delta.generation == generation else None
+
+def write_index_delta(path, delta):
+    # "-" prints to stdout
+    encoded = json.dumps(delta.to_dict(), indent=4)
+    if path == "-":
+        print(encoded, flush=True)
+        return
+    with open(path, "w") as f:
+        f.write(encoded + "\n")
@@ -0,0 +1,243 @@
+import mmap
+import os
+import shutil
+import struct
+import sys
+import zlib
+from array import array
+
+INDEX_CACHE_DIR = os.getenv("THUNDERSTORE_CACHE_DIR", ".cache/thunderstore")
+INDEX_STORE_FILE = "packages.idx"
+# "dependencies" holds the space separated dependency strings of the latest version, "download_url" its zip,
+# "versions" every release number in ascending version order, "digest" a hash of the entry the snapshot compares against,
+# "deprecated" is "1" for a deprecated package and empty otherwise
+INDEX_STORE_COLUMNS = ("version", "package_url", "dependencies", "download_url", "versions", "date_updated", "digest", "deprecated")
+
+# Layout (all integers are little-endian u32):
+#   header        magic, record count, column count, string count, slot count
+#   string table  string count + 1 offsets into the string pool
+#   records       record count rows of (name id, one string id per column), in the order they were written
+#   slots         open-addressing hash table, record index + 1 (0 = empty slot)
+#   string pool   utf-8 encoded strings; the column names come first, short values such as versions are stored once
+STORE_MAGIC = b"TSIDX001"
+HEADER = struct.Struct("<8sIIII")
+U32 = struct.Struct("<I")
+# Longer values (URLs, digests, release lists) are nearly always unique, interning them would only cost memory;
+# the interned ones are capped so the table stays small whatever the size of the community
+INTERN_MAX_LENGTH = 64
+INTERN_LIMIT = 65536
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def _slot_count(record_count):
+    slots = 8
+    while slots < record_count * 2:
+        slots *= 2
+    return slots
+
+def _hash(name_bytes):
+    return zlib.crc32(name_bytes)
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+class IndexStoreWriter:
+    # Writes a store while the records stream in. The string pool, its offsets and the rows are spilled to
+    # temporary files next to the store; only a hash per record stays in memory to build the slot table.
+    # finish() leaves the complete store at tmp_path, commit() moves it into place, discard() drops it
+    def __init__(self, path, columns=INDEX_STORE_COLUMNS):
+        self.path = path
+        self.columns = tuple(columns)
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._parts = {part: open(f"{path}.{part}.tmp", "w+b") for part in ("pool", "offsets", "rows")}
+        self._hashes = array("I")
+        self._interned = {}
+        self._string_count = 0
+        self._pool_size = 0
+        self._parts["offsets"].write(U32.pack(0))
+        for column in self.columns:
+            self._intern(column, force=True)
+
+    def _intern(self, value, force=False):
+        string_id = self._interned.get(value)
+        if string_id is not None:
+            return string_id
+        encoded = value.encode("utf-8")
+        string_id = self._string_count
+        self._string_count += 1
+        self._parts["pool"].write(encoded)
+        self._pool_size += len(encoded)
+        self._parts["offsets"].write(U32.pack(self._pool_size))
+        if force or (len(value) <= INTERN_MAX_LENGTH and len(self._interned) < INTERN_LIMIT):
+            self._interned[value] = string_id
+        return string_id
+
+    def add(self, name, row):
+        # row holds one string per column; names are expected to be unique
+        ids = [self._intern(name)]
+        ids.extend(self._intern(value or "") for value in row)
+        self._parts["rows"].write(struct.pack(f"<{len(ids)}I", *ids))
+        self._hashes.append(_hash(name.encode("utf-8")))
+        self.count += 1
+
+    def finish(self):
+        slot_count = _slot_count(self.count)
+        mask = slot_count - 1
+        slots = array("I", bytes(U32.size * slot_count))
+        for index, name_hash in enumerate(self._hashes):
+            slot = name_hash & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = index + 1
+        self._hashes = array("I")
+
+        with open(self.tmp_path, "wb") as f:
+            f.write(HEADER.pack(STORE_MAGIC, self.count, len(self.columns), self._string_count, slot_count))
+            for part in ("offsets", "rows"):
+                self._parts[part].seek(0)
+                shutil.copyfileobj(self._parts[part], f, COPY_BUFFER_SIZE)
+            f.write(_little_endian(slots))
+            del slots
+            self._parts["pool"].seek(0)
+            shutil.copyfileobj(self._parts["pool"], f, COPY_BUFFER_SIZE)
+        self._close_parts()
+        return self.tmp_path
+
+    def commit(self):
+        os.replace(self.tmp_path, self.path)
+
+    def _close_parts(self):
+        for part, f in self._parts.items():
+            f.close()
+            try:
+                os.remove(f"{self.path}.{part}.tmp")
+            except FileNotFoundError:
+                pass
+        self._parts = {}
+
+    def discard(self):
+        self._close_parts()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+
+class IndexStore:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty, not a package index store")
+        try:
+            magic, self._record_count, self._column_count, string_count, self._slot_count = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            magic = None
+        if magic != STORE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a package index store")
+        self._offsets_at = HEADER.size
+        self._rows_at = self._offsets_at + (string_count + 1) * U32.size
+        self._row_width = (1 + self._column_count) * U32.size
+        self._slots_at = self._rows_at + self._record_count * self._row_width
+        self._pool_at = self._slots_at + self._slot_count * U32.size
+        self.columns = tuple(self._string(i) for i in range(self._column_count))
+
+    def _u32(self, offset):
+        return U32.unpack_from(self._mm, offset)[0]
+
+    def _string_bytes(self, string_id):
+        start, end = struct.unpack_from("<II", self._mm, self._offsets_at + string_id * U32.size)
+        return self._mm[self._pool_at + start:self._pool_at + end]
+
+    def _string(self, string_id):
+        return self._string_bytes(string_id).decode("utf-8")
+
+    def _find(self, name):
+        encoded = name.encode("utf-8")
+        mask = self._slot_count - 1
+        slot = _hash(encoded) & mask
+        while True:
+            index = self._u32(self._slots_at + slot * U32.size)
+            if index == 0:
+                return None
+            row_at = self._rows_at + (index - 1) * self._row_width
+            if self._string_bytes(self._u32(row_at)) == encoded:
+                return row_at
+            slot = (slot + 1) & mask
+
+    def row(self, name):
+        row_at = self._find(name)
+        if row_at is None:
+            return None
+        ids = struct.unpack_from(f"<{self._column_count}I", self._mm, row_at + U32.size)
+        return tuple(self._string(string_id) for string_id in ids)
+
+    def value(self, name, column):
+        # Decodes a single column of the row, None when the package is unknown
+        row_at = self._find(name)
+        if row_at is None:
+            return None
+        return self._string(self._u32(row_at + (1 + self.columns.index(column)) * U32.size))
+
+    def get(self, name, default=None):
+        row = self.row(name)
+        if row is None:
+            return default
+        return dict(zip(self.columns, row))
+
+    def __getitem__(self, name):
+        row = self.get(name)
+        if row is None:
+            raise KeyError(name)
+        return row
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def __len__(self):
+        return self._record_count
+
+    def __iter__(self):
+        for index in range(self._record_count):
+            yield self._string(self._u32(self._rows_at + index * self._row_width))
+
+    def items(self):
+        row_format = f"<{1 + self._column_count}I"
+        for index in range(self._record_count):
+            name_id, *ids = struct.unpack_from(row_format, self._mm, self._rows_at + index * self._row_width)
+            yield self._string(name_id), dict(zip(self.columns, (self._string(string_id) for string_id in ids)))
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_index_store(path, columns=INDEX_STORE_COLUMNS):
+    # The store at path when it holds the given columns, None when it is missing, unreadable or of another layout
+    if not os.path.exists(path):
+        return None
+    try:
+        store = IndexStore(path)
+    except ValueError:
+        return None
+    if store.columns != tuple(columns):
+        store.close()
+        return None
+    return store
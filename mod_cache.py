@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from build_modpack import pack_entries, write_zip
+from changeset import parse_dependency
+from modpack import PACK_FILES
+
+MOD_CACHE_DIR = os.getenv("MOD_CACHE_DIR", ".cache/mods")
+# Overrides the index URLs, e.g. to serve the zips from a mirror or a local file server
+THUNDERSTORE_DOWNLOAD_URL = os.getenv("THUNDERSTORE_DOWNLOAD_URL")
+DEFAULT_DOWNLOAD_URL = "https://thunderstore.io/package/download/{namespace}/{name}/{version}/"
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+REFS_FILE = "refs.json"
+
+def download_url(dependency, package=None):
+    full_name, version = parse_dependency(dependency)
+    namespace, name = full_name.split("-", 1)
+    if THUNDERSTORE_DOWNLOAD_URL:
+        return THUNDERSTORE_DOWNLOAD_URL.format(namespace=namespace, name=name, version=version)
+    # The index only carries the URL of the latest release, older ones follow the same pattern
+    if package and package.get("version") == version and package.get("download_url"):
+        return package["download_url"]
+    return DEFAULT_DOWNLOAD_URL.format(namespace=namespace, name=name, version=version)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ModCache:
+    # Zips are stored once under their SHA-256; refs.json maps every "namespace-name-version" to its object
+    def __init__(self, directory=MOD_CACHE_DIR):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.partial_dir = os.path.join(directory, "partial")
+        self.refs_path = os.path.join(directory, REFS_FILE)
+        self.lock = threading.Lock()
+        try:
+            with open(self.refs_path, "r") as f:
+                self.refs = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.refs = {}
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.zip")
+
+    def get(self, dependency):
+        # A release never changes once published, so a present object of the right size is reused as is
+        ref = self.refs.get(dependency)
+        if ref is None:
+            return None
+        path = self.object_path(ref["sha256"])
+        try:
+            if os.path.getsize(path) == ref["size"]:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def add(self, dependency, tmp_path):
+        digest = file_sha256(tmp_path)
+        size = os.path.getsize(tmp_path)
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.refs[dependency] = {"sha256": digest, "size": size}
+        return path
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.refs_path}.tmp"
+        with self.lock:
+            encoded = json.dumps(self.refs, indent=4, sort_keys=True)
+        with open(tmp_path, "w") as f:
+            f.write(encoded)
+        os.replace(tmp_path, self.refs_path)
+
+def download_mod(session, cache, dependency, url, timeout_time, max_retries, retry_delay, count_bytes=None):
+    # Interrupted transfers stay in partial/ and resume with a Range request on the next attempt or run
+    os.makedirs(cache.partial_dir, exist_ok=True)
+    part_path = os.path.join(cache.partial_dir, f"{dependency}.part")
+    validator_path = f"{part_path}.json"
+    for attempt in range(1, max_retries + 1):
+        try:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validator = None
+            if offset and os.path.exists(validator_path):
+                with open(validator_path, "r") as f:
+                    validator = json.load(f).get("validator")
+            # Ranges only make sense on the raw bytes, and zips do not compress further anyway
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                if validator:
+                    headers["If-Range"] = validator
+
+            with session.get(url, headers=headers, stream=True, timeout=timeout_time) as resp:
+                if resp.status_code == 416:
+                    # The partial file is not a prefix of what the server has now
+                    os.remove(part_path)
+                    raise requests.HTTPError(f"416 for {url}, restarting from scratch", response=resp)
+                resp.raise_for_status()
+                resumed = resp.status_code == 206 and resp.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+                if not resumed:
+                    offset = 0
+                with open(validator_path, "w") as f:
+                    json.dump({"url": url, "validator": resp.headers.get("ETag") or resp.headers.get("Last-Modified")}, f)
+                length = resp.headers.get("Content-Length")
+                expected = offset + int(length) if length is not None else None
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        if count_bytes:
+                            count_bytes(len(chunk))
+
+            size = os.path.getsize(part_path)
+            if expected is not None and size != expected:
+                raise requests.ConnectionError(f"Transfer of {url} ended after {size} of {expected} bytes")
+            if not zipfile.is_zipfile(part_path):
+                os.remove(part_path)
+                raise ValueError(f"{url} did not return a zip file")
+            path = cache.add(dependency, part_path)
+            os.remove(validator_path)
+            return path
+        except (requests.RequestException, OSError, ValueError):
+            if attempt == max_retries:
+                raise
+            time.sleep(retry_delay)
+
+def download_mods(dependencies, lookup, cache, max_concurrency, timeout_time, max_retries, retry_delay, user_agent, count_bytes=None):
+    # Returns the cached zip of every dependency, the ones that failed with their error, and how many were downloaded
+    paths = {}
+    pending = []
+    for dependency in dict.fromkeys(dependencies):
+        path = cache.get(dependency)
+        if path is not None:
+            paths[dependency] = path
+        else:
+            pending.append(dependency)
+
+    failed = {}
+    if pending:
+        with requests.Session() as session:
+            session.headers["User-Agent"] = user_agent
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            def fetch(dependency):
+                url = download_url(dependency, lookup.get(parse_dependency(dependency)[0]))
+                try:
+                    return dependency, download_mod(session, cache, dependency, url, timeout_time, max_retries, retry_delay, count_bytes), None
+                except (requests.RequestException, OSError, ValueError) as e:
+                    return dependency, None, e
+
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                for dependency, path, error in pool.map(fetch, pending):
+                    if error is None:
+                        paths[dependency] = path
+                    else:
+                        failed[dependency] = error
+        cache.save()
+    return paths, failed, len(pending) - len(failed)
+
+def link_or_copy(source, destination):
+    # Hard links keep assembled packs free on disk; copies when the cache lives on another filesystem
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+def assemble_pack(pack_directory, mod_paths, output, as_zip=False):
+    # Pack files at the root and every mod zip under mods/, as a directory or a single zip
+    pack_files = [name for name in PACK_FILES if os.path.exists(os.path.join(pack_directory, name))]
+    if as_zip:
+        # Mod zips are already compressed, so they are stored as they are
+        mods = [(f"mods/{dependency}.zip", path, False) for dependency, path in sorted(mod_paths.items())]
+        write_zip(output, pack_entries(pack_directory, required=()) + mods)
+        return output
+
+    mods_dir = os.path.join(output, "mods")
+    os.makedirs(mods_dir, exist_ok=True)
+    for name in pack_files:
+        shutil.copyfile(os.path.join(pack_directory, name), os.path.join(output, name))
+    wanted = {f"{dependency}.zip" for dependency in mod_paths}
+    for name in os.listdir(mods_dir):
+        if name not in wanted:
+            os.remove(os.path.join(mods_dir, name))
+    for dependency, path in mod_paths.items():
+        link_or_copy(path, os.path.join(mods_dir, f"{dependency}.zip"))
+    return output
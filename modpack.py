@@ -0,0 +1,46 @@
+import glob
+import os
+
+MANIFEST_PATH = "manifest.json"
+SNAPSHOT_PATH = ".dependencies_snapshot.json"
+VERSION_PATH = "version.txt"
+CHANGELOG_PATH = "CHANGELOG.md"
+THUNDERSTORE_TOML_PATH = "thunderstore.toml"
+CONSTRAINTS_PATH = "constraints.json"
+# Files of a pack that go into the published zip, in archive order
+PACK_FILES = (MANIFEST_PATH, "icon.png", "README.md", CHANGELOG_PATH)
+
+class Modpack:
+    # Where one pack keeps its files; the repository root is the default single pack
+    def __init__(self, directory="."):
+        self.directory = os.path.normpath(directory)
+        self.name = os.path.basename(os.path.abspath(directory))
+        self.manifest_path = self.path(MANIFEST_PATH)
+        self.snapshot_path = self.path(SNAPSHOT_PATH)
+        self.version_path = self.path(VERSION_PATH)
+        self.changelog_path = self.path(CHANGELOG_PATH)
+        self.toml_path = self.path(THUNDERSTORE_TOML_PATH)
+        self.constraints_path = self.path(CONSTRAINTS_PATH)
+
+    def path(self, filename):
+        return os.path.normpath(os.path.join(self.directory, filename))
+
+def find_modpacks(patterns):
+    # Returns the packs in a stable order and the patterns that matched no pack directory
+    packs = []
+    unmatched = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        found = False
+        for directory in matches:
+            key = os.path.realpath(directory)
+            if not os.path.isfile(os.path.join(directory, MANIFEST_PATH)):
+                continue
+            found = True
+            if key not in seen:
+                seen.add(key)
+                packs.append(Modpack(directory))
+        if not found:
+            unmatched.append(pattern)
+    return packs, unmatched
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOCK_FILE = ".update.lock"
+JOURNAL_FILE = ".update.journal"
+STAGED_SUFFIX = ".staged"
+OUTPUT_LOCK_TIMEOUT = float(os.getenv("OUTPUT_LOCK_TIMEOUT", 300))
+HASH_BUFFER_SIZE = 64 * 1024
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_BUFFER_SIZE):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.digest()
+
+def fsync_path(path):
+    # Directories cannot be opened for syncing everywhere; there the rename is as durable as it gets
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class OutputStage:
+    # Every file a run writes is staged first; leaving the block moves the ones that differ from disk into place
+    # as one unit under the directory lock, an exception discards them all. A run killed halfway through the
+    # renames is completed by the next stage opened on the directory, using the journal it left behind.
+    def __init__(self, directory=".", dry_run=False, lock_timeout=OUTPUT_LOCK_TIMEOUT):
+        self.directory = directory or "."
+        self.dry_run = dry_run
+        self.lock_timeout = lock_timeout
+        self.lock_path = os.path.join(self.directory, LOCK_FILE)
+        self.journal_path = os.path.join(self.directory, JOURNAL_FILE)
+        self.staged = {}
+        self.changed = []
+        self.unchanged = []
+        self.committed = False
+        self._lock_fd = None
+
+    def write(self, path, content):
+        # Rendered content, compared against the file on disk by hash when the stage commits
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self.staged[path] = content
+
+    def open(self, path, mode="wb", **kwargs):
+        # For content too large to render in memory: the caller streams it into the staged file
+        if self.dry_run:
+            raise ValueError("a dry run only compares rendered content")
+        self.staged[path] = None
+        return open(f"{path}{STAGED_SUFFIX}", mode, **kwargs)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            if fcntl is not None:
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.ftruncate(fd, 0)
+                    os.write(fd, str(os.getpid()).encode())
+                    self._lock_fd = fd
+                    return
+                except BlockingIOError:
+                    os.close(fd)
+            else:
+                # Without flock a crashed run leaves the file behind and it has to be removed by hand
+                try:
+                    self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+                    os.write(self._lock_fd, str(os.getpid()).encode())
+                    return
+                except FileExistsError:
+                    pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{self.lock_path} is held by another run")
+            time.sleep(0.2)
+
+    def release(self):
+        if self._lock_fd is None:
+            return
+        os.close(self._lock_fd)
+        self._lock_fd = None
+        if fcntl is None:
+            os.remove(self.lock_path)
+
+    def recover(self):
+        # Moves listed in a journal were committed to, so they are finished; any other staged file is dropped
+        try:
+            with open(self.journal_path, "r") as f:
+                moves = json.load(f)
+        except FileNotFoundError:
+            moves = []
+        for staged_path, path in moves:
+            if os.path.exists(staged_path):
+                os.replace(staged_path, path)
+        if moves:
+            fsync_path(self.directory)
+            os.remove(self.journal_path)
+        for name in os.listdir(self.directory):
+            if name.endswith(STAGED_SUFFIX):
+                os.remove(os.path.join(self.directory, name))
+
+    def commit(self):
+        if self.committed:
+            return
+        self.committed = True
+        moves = []
+        for path, content in self.staged.items():
+            staged_path = f"{path}{STAGED_SUFFIX}"
+            if content is None:
+                same = file_digest(staged_path) == file_digest(path)
+            else:
+                same = hashlib.sha256(content).digest() == file_digest(path)
+            if same:
+                self.unchanged.append(path)
+                if content is None:
+                    os.remove(staged_path)
+                continue
+            self.changed.append(path)
+            if self.dry_run:
+                continue
+            with open(staged_path, "ab" if content is None else "wb") as f:
+                if content is not None:
+                    f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            moves.append((staged_path, path))
+        if not moves:
+            return
+
+        journal_tmp_path = f"{self.journal_path}.tmp"
+        with open(journal_tmp_path, "w") as f:
+            json.dump(moves, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal_tmp_path, self.journal_path)
+        fsync_path(self.directory)
+        for staged_path, path in moves:
+            os.replace(staged_path, path)
+        fsync_path(self.directory)
+        os.remove(self.journal_path)
+
+    def discard(self):
+        # Once the journal exists the moves are committed to and the next stage finishes them
+        if os.path.exists(self.journal_path):
+            return
+        for path in self.staged:
+            try:
+                os.remove(f"{path}{STAGED_SUFFIX}")
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        if not self.dry_run:
+            self.acquire()
+            try:
+                self.recover()
+            except BaseException:
+                self.release()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            elif not self.dry_run:
+                self.discard()
+        finally:
+            self.release()
+
+def commit_files(files, dry_run=False):
+    # One-off stage for callers writing a few rendered files of the same directory; returns the changed paths
+    directory = os.path.dirname(next(iter(files))) if files else "."
+    with OutputStage(directory, dry_run=dry_run) as output:
+        for path, content in files.items():
+            output.write(path, content)
+    return output.changed
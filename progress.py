@@ -0,0 +1,117 @@
+import atexit
+import itertools
+import queue
+import shutil
+import sys
+import threading
+
+SPINNER_FRAMES = ['⠋', '⠙', '⠚', '⠞', '⠖', '⠦', '⠴', '⠲', '⠳', '⠓']
+PROGRESS_BAR_WIDTH = 20
+
+class ProgressRenderer:
+    # One long-lived thread draws the spinner and every log line printed while it runs,
+    # so logging only queues a record and never starts or joins a thread.
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.records = queue.Queue()
+        # Lines written straight to stdout (no TTY, or no spinner running) come from any thread, and colorama
+        # splits every write at its escape codes, so each line is written whole under this lock
+        self.lock = threading.Lock()
+        self.thread = None
+        self.active = False
+        self.interactive = None
+        self.progress = None
+
+    def is_interactive(self):
+        if self.interactive is None:
+            self.interactive = sys.stdout.isatty()
+        return self.interactive
+
+    def start(self, message):
+        if self.active:
+            self.stop()
+        self.progress = None
+        if not self.is_interactive():
+            # CI logs get one plain line per phase instead of spinner frames
+            self.write_line(message.rstrip())
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="progress-renderer", daemon=True)
+            self.thread.start()
+        self.active = True
+        self.records.put(("start", message))
+
+    def update(self, done, total):
+        # Read by the next frame, nothing to wake up
+        self.progress = (done, total)
+
+    def log(self, line):
+        if self.active:
+            self.records.put(("log", line))
+        else:
+            self.write_line(line)
+
+    def stop(self):
+        # Returns once every queued line is printed and the spinner line is cleared
+        if not self.active:
+            return
+        self.active = False
+        done = threading.Event()
+        self.records.put(("stop", done))
+        done.wait()
+
+    def write_line(self, line):
+        with self.lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def run(self):
+        message = None
+        frames = itertools.cycle(SPINNER_FRAMES)
+        while True:
+            try:
+                kind, value = self.records.get(timeout=self.delay if message is not None else None)
+            except queue.Empty:
+                self.draw(message, next(frames))
+                continue
+            if kind == "start":
+                message = value
+                sys.stdout.write("\033[?25l")
+                self.draw(message, next(frames))
+            elif kind == "log":
+                sys.stdout.write("\r\033[K" + value + "\n")
+                if message is not None:
+                    self.draw(message, next(frames))
+            elif kind == "stop":
+                message = None
+                sys.stdout.write("\r\033[K\033[?25h")
+                sys.stdout.flush()
+                value.set()
+
+    def draw(self, message, frame):
+        line = f"{message}{frame}"
+        if self.progress is not None:
+            done, total = self.progress
+            filled = PROGRESS_BAR_WIDTH * done // total if total else PROGRESS_BAR_WIDTH
+            line += f" [{'█' * filled}{'·' * (PROGRESS_BAR_WIDTH - filled)}] {done}/{total}"
+        # A wrapped line could not be cleared with \r
+        width = shutil.get_terminal_size().columns - 1
+        sys.stdout.write("\r" + line[:width] + "\033[K")
+        sys.stdout.flush()
+
+RENDERER = ProgressRenderer()
+atexit.register(RENDERER.stop)
+
+class Spinner:
+    def __init__(self, message="Processing... ", renderer=RENDERER):
+        self.message = message
+        self.renderer = renderer
+
+    def start(self):
+        self.renderer.start(self.message)
+
+    def update(self, done, total):
+        self.renderer.update(done, total)
+
+    def stop(self):
+        self.renderer.stop()
@@ -0,0 +1,185 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+import requests
+from packaging.version import InvalidVersion, Version
+from requests.adapters import HTTPAdapter
+
+RELEASE_NOTES_CACHE_DIR = os.getenv("RELEASE_NOTES_CACHE_DIR", ".cache/release-notes")
+RELEASE_NOTES_MAX_CHARS = int(os.getenv("RELEASE_NOTES_MAX_CHARS", 800))
+RELEASE_NOTES_MAX_LINES = int(os.getenv("RELEASE_NOTES_MAX_LINES", 15))
+# "## 1.2.0", "### [v1.2.0] - 2025-01-01", "# Version 1.2"
+VERSION_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s*(?:version\s+)?\[?v?(\d+(?:\.\d+){1,3})\b", re.IGNORECASE)
+HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s*")
+
+class NotesCache:
+    # One file per "namespace-name-version"; a release never changes its changelog, so an entry is kept forever.
+    # Packages without a changelog are cached too, as null, so they are not asked again either
+    def __init__(self, directory=RELEASE_NOTES_CACHE_DIR):
+        self.directory = directory
+
+    def path(self, dependency):
+        return os.path.join(self.directory, f"{dependency}.json")
+
+    def get(self, dependency):
+        # (found, markdown); markdown is None for a release without a changelog
+        try:
+            with open(self.path(dependency), "r", encoding="utf-8") as f:
+                return True, json.load(f)["markdown"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return False, None
+
+    def put(self, dependency, markdown):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(dependency)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"markdown": markdown}, f)
+        os.replace(tmp_path, self.path(dependency))
+
+def changelog_url(api, full_name, version):
+    namespace, name = full_name.split("-", 1)
+    return f"{api}{namespace}/{name}/{version}/changelog/"
+
+def fetch_changelog(session, url, timeout_time):
+    # The markdown of the release's CHANGELOG.md, None when the package has none
+    resp = session.get(url, timeout=timeout_time)
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return resp.json().get("markdown") or None
+
+def parse_heading_version(line):
+    match = VERSION_HEADING_RE.match(line)
+    if not match:
+        return None
+    try:
+        return Version(match.group(1))
+    except InvalidVersion:
+        return None
+
+def select_release_notes(markdown, old_version, new_version):
+    # The sections for the releases after old_version up to new_version. A changelog without version
+    # headings is kept whole; one whose headings skip this range has nothing to say about it
+    try:
+        lower, upper = Version(old_version), Version(new_version)
+    except InvalidVersion:
+        return markdown
+    lines = markdown.splitlines()
+    selected = []
+    headings = False
+    keep = False
+    for line in lines:
+        heading_version = parse_heading_version(line)
+        if heading_version is not None:
+            headings = True
+            keep = lower < heading_version <= upper
+        if keep:
+            selected.append(line)
+    if not headings:
+        return markdown
+    return "\n".join(selected)
+
+def render_release_notes(notes, indent="  ", max_chars=RELEASE_NOTES_MAX_CHARS, max_lines=RELEASE_NOTES_MAX_LINES):
+    # Quoted under the list item; headings become bold lines, so nothing can look like a release heading of ours
+    lines = []
+    size = 0
+    truncated = False
+    for line in notes.strip().splitlines():
+        line = line.rstrip()
+        if not line and (not lines or not lines[-1]):
+            continue
+        if HEADING_RE.match(line):
+            line = f"**{HEADING_RE.sub('', line).strip('# ')}**"
+        if len(lines) >= max_lines or size + len(line) > max_chars:
+            truncated = True
+            break
+        lines.append(line)
+        size += len(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    if not lines:
+        return ""
+    if truncated:
+        lines.append("…")
+    return "".join(f"{indent}> {line}\n" if line else f"{indent}>\n" for line in lines)
+
+def fetch_release_notes(changes, api, user_agent, cache=None, max_workers=8, timeout_time=10, deadline=20, offline=False, warn=None):
+    # Rendered release notes of the updated mods, keyed by full name. Whatever is not back when the deadline
+    # passes is left out of this release: the workers are daemon threads that take no new work after it,
+    # so a read still hanging cannot hold up the exit, and one that does finish still fills the cache
+    cache = cache or NotesCache()
+    markdown = {}
+    pending = []
+    for change in changes:
+        found, cached = cache.get(change.dependency)
+        if found:
+            markdown[change.full_name] = cached
+        else:
+            pending.append(change)
+
+    if pending and not offline:
+        session = requests.Session()
+        session.headers["User-Agent"] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        work = queue.Queue()
+        for change in pending:
+            work.put(change)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    change = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    notes = fetch_changelog(session, changelog_url(api, change.full_name, change.new_version), timeout_time)
+                except (requests.RequestException, ValueError) as e:
+                    results.put((change, None, e))
+                    continue
+                # A cache that cannot be written (disk full, read-only) only costs the next run a request
+                try:
+                    cache.put(change.dependency, notes)
+                except OSError as e:
+                    if warn:
+                        warn(f"Could not cache the release notes of {change.dependency}: {e}")
+                results.put((change, notes, None))
+
+        for _ in range(min(max_workers, len(pending))):
+            threading.Thread(target=worker, daemon=True).start()
+        deadline_at = time.monotonic() + deadline
+        received = 0
+        try:
+            while received < len(pending):
+                try:
+                    change, notes, error = results.get(timeout=max(0, deadline_at - time.monotonic()))
+                except queue.Empty:
+                    break
+                received += 1
+                if error is None:
+                    markdown[change.full_name] = notes
+                elif warn:
+                    warn(f"No release notes for {change.dependency}: {error}")
+        finally:
+            stop.set()
+            session.close()
+        if received < len(pending) and warn:
+            warn(f"Release notes deadline reached, {len(pending) - received} mods left without notes")
+
+    notes = {}
+    for change in changes:
+        text = markdown.get(change.full_name)
+        if text:
+            text = select_release_notes(text, change.old_version, change.new_version)
+            rendered = render_release_notes(text)
+            if rendered:
+                notes[change.full_name] = rendered
+    return notes
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COUNTERS = ("bytes_downloaded", "packages_parsed", "deps_evaluated", "deps_reused", "cache_hits")
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class RunMetrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.phases = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "total_seconds": round(time.perf_counter() - self._start, 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+            "peak_rss_bytes": peak_rss_bytes()
+        }
+
+    def to_markdown(self):
+        data = self.to_dict()
+        lines = ["## ⏱️ Dependency update metrics", "", "| Phase | Seconds |", "| --- | ---: |"]
+        for name, seconds in data["phases"].items():
+            lines.append(f"| {name} | {seconds:.3f} |")
+        lines.append(f"| **total** | **{data['total_seconds']:.3f}** |")
+        lines += ["", "| Counter | Value |", "| --- | ---: |"]
+        for name, value in data["counters"].items():
+            lines.append(f"| {name} | {value} |")
+        if data["peak_rss_bytes"] is not None:
+            lines.append(f"| peak_rss_mib | {data['peak_rss_bytes'] / 1024 / 1024:.1f} |")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        # "-" prints to stdout
+        encoded = json.dumps(self.to_dict(), indent=4)
+        if path == "-":
+            print(encoded, flush=True)
+            return
+        with open(path, "w") as f:
+            f.write(encoded + "\n")
+
+    def write_step_summary(self, path=None):
+        path = path or os.getenv("GITHUB_STEP_SUMMARY")
+        if not path:
+            return
+        with open(path, "a") as f:
+            f.write(self.to_markdown())
@@ -0,0 +1,136 @@
+import json
+import os
+import re
+
+SEARCH_INDEX_FILE = "search.json"
+SEARCH_INDEX_FORMAT = 1
+# Share of the query trigrams a package has to contain to count as a hit
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.5))
+# A trigram found only in the description is worth less than one in the name or owner
+DESCRIPTION_WEIGHT = 0.5
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# "MoreCompany" is also indexed as "More Company", so either spelling finds it
+CAMEL_CASE_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+SEARCH_SORTS = ("relevance", "downloads", "rating")
+
+def trigrams(text):
+    # Every word padded with a space on both sides, so short words and word boundaries match too
+    grams = set()
+    for token in TOKEN_RE.findall(text.lower()):
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def name_text(owner, name):
+    return f"{name} {CAMEL_CASE_RE.sub(' ', name)} {owner} {CAMEL_CASE_RE.sub(' ', owner)}"
+
+class SearchHit:
+    __slots__ = ("full_name", "owner", "name", "version", "description", "downloads", "rating", "deprecated", "nsfw", "relevance")
+
+    def __init__(self, document, relevance):
+        self.full_name, self.owner, self.name, self.version, self.description, self.downloads, self.rating, self.deprecated, self.nsfw = document
+        self.relevance = relevance
+
+    @property
+    def dependency(self):
+        return f"{self.full_name}-{self.version}"
+
+def package_document(package):
+    # The fields a hit is shown and ranked with: the latest release's description, downloads over every release
+    versions = package["versions"]
+    return [
+        package["full_name"],
+        package.get("owner", ""),
+        package.get("name", ""),
+        versions[0].get("version_number", ""),
+        versions[0].get("description", ""),
+        sum(entry.get("downloads", 0) for entry in versions),
+        package.get("rating_score", 0),
+        bool(package.get("is_deprecated")),
+        bool(package.get("has_nsfw_content")),
+    ]
+
+class SearchIndex:
+    # Inverted trigram index: every trigram maps to the ids of the packages containing it, kept as a space
+    # separated string until a query needs it, so loading the file does not parse every posting list
+    def __init__(self, documents, names, descriptions, source=None):
+        self.documents = documents
+        self.names = names
+        self.descriptions = descriptions
+        self.source = source
+
+    @classmethod
+    def build(cls, packages, source=None):
+        documents = []
+        names = {}
+        descriptions = {}
+        for package in packages:
+            if not package.get("full_name") or not package.get("versions"):
+                continue
+            doc_id = len(documents)
+            document = package_document(package)
+            documents.append(document)
+            name_grams = trigrams(name_text(document[1], document[2]))
+            for gram in name_grams:
+                names.setdefault(gram, []).append(doc_id)
+            for gram in trigrams(document[4]) - name_grams:
+                descriptions.setdefault(gram, []).append(doc_id)
+        names = {gram: " ".join(map(str, ids)) for gram, ids in names.items()}
+        descriptions = {gram: " ".join(map(str, ids)) for gram, ids in descriptions.items()}
+        return cls(documents, names, descriptions, source)
+
+    @classmethod
+    def load(cls, path, source=None):
+        # None when the file is missing, unreadable or built from another copy of the index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if raw.get("format") != SEARCH_INDEX_FORMAT or raw.get("source") != source:
+            return None
+        return cls(raw["documents"], raw["names"], raw["descriptions"], source)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": SEARCH_INDEX_FORMAT,
+                "source": self.source,
+                "documents": self.documents,
+                "names": self.names,
+                "descriptions": self.descriptions
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query, limit=20, sort="relevance", include_deprecated=False, include_nsfw=False, min_similarity=SEARCH_MIN_SIMILARITY):
+        # Hits sharing at least min_similarity of the query trigrams; ranked by relevance with downloads and
+        # rating breaking ties, or by downloads or rating alone
+        grams = trigrams(query)
+        if not grams:
+            return []
+        scores = {}
+        for gram in grams:
+            for doc_id in self.names.get(gram, "").split():
+                scores[doc_id] = scores.get(doc_id, 0) + 1
+            for doc_id in self.descriptions.get(gram, "").split():
+                scores[doc_id] = scores.get(doc_id, 0) + DESCRIPTION_WEIGHT
+        threshold = min_similarity * len(grams)
+        hits = []
+        for doc_id, score in scores.items():
+            if score < threshold:
+                continue
+            hit = SearchHit(self.documents[int(doc_id)], score / len(grams))
+            if (hit.deprecated and not include_deprecated) or (hit.nsfw and not include_nsfw):
+                continue
+            hits.append(hit)
+        if sort == "downloads":
+            hits.sort(key=lambda hit: (hit.downloads, hit.rating), reverse=True)
+        elif sort == "rating":
+            hits.sort(key=lambda hit: (hit.rating, hit.downloads), reverse=True)
+        else:
+            hits.sort(key=lambda hit: (round(hit.relevance, 1), hit.downloads, hit.rating), reverse=True)
+        return hits[:limit] if limit else hits
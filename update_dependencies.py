@@ -1,62 +1,75 @@
 import json
 import os
+import re
+import codecs
+import gzip
+import hashlib
 import requests
 from packaging import version
-import subprocess
 from datetime import date
 import sys
 import time
 import argparse
-import threading
 import itertools
+import threading
+import signal
+import cProfile
 from colorama import init, Fore, Style
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from index_store import INDEX_CACHE_DIR, INDEX_STORE_COLUMNS, INDEX_STORE_FILE, IndexStore, IndexStoreWriter, open_index_store
+from index_delta import IndexDelta, IndexDeltaBuilder, load_index_delta, save_index_delta, write_index_delta
+from dependency_graph import DependencyGraph, resolve_dependencies
+from changeset import SNAPSHOT_FORMAT, ChangeSet, is_newer, merge_dependencies, parse_dependency, snapshot_entries, snapshot_generation, snapshot_record
+from changelog_store import prepend_changelog
+from download_engine import RETRY_STATUSES, DownloadError, ResumableDownload, RetryPolicy, parse_retry_after
+from output_stage import OutputStage, commit_files
+from release_notes import RELEASE_NOTES_CACHE_DIR, NotesCache, fetch_release_notes
+from constraints import best_version, load_constraints, parse_constraints, sort_versions
+from run_metrics import RunMetrics
+from progress import RENDERER, Spinner
+from generate_thunderstore_toml import render_thunderstore_toml
+from mod_cache import MOD_CACHE_DIR, ModCache, assemble_pack, download_mods
+from modpack import MANIFEST_PATH, Modpack, find_modpacks
+from search_index import SEARCH_INDEX_FILE, SEARCH_MIN_SIMILARITY, SEARCH_SORTS, SearchIndex
 
 GITHUB_REPO = os.getenv("GITHUB_REPOSITORY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+MISSING_ISSUE_PREFIX = "Dependency not found: "
+GITHUB_ISSUES_CACHE = "github_issues.json"
+GITHUB_MAX_RATE_LIMIT_WAIT = 300
 
 THUNDERSTORE_API = os.getenv(
     "THUNDERSTORE_API",
     "https://thunderstore.io/c/repo/api/v1/package/"
 )
-MANIFEST_PATH = "manifest.json"
-SNAPSHOT_PATH = ".dependencies_snapshot.json"
-
-class Spinner:
-    def __init__(self, message="Processing... ", delay=0.1):
-        self.spinner = itertools.cycle(['⠋', '⠙', '⠚', '⠞', '⠖', '⠦', '⠴', '⠲', '⠳', '⠓'])
-        self.stop_running = False
-        self.message = message
-        self.delay = delay
-        self.thread = threading.Thread(target=self.spin)
-        self.use_cursor_control = sys.stdout.isatty()
-
-    def hide_cursor(self):
-        if self.use_cursor_control:
-            sys.stdout.write("\033[?25l")
-            sys.stdout.flush()
-
-    def show_cursor(self):
-        if self.use_cursor_control:
-            sys.stdout.write("\033[?25h")
-            sys.stdout.flush()
-
-    def spin(self):
-        self.hide_cursor()
-        while not self.stop_running:
-            sys.stdout.write(f"\r{self.message}{next(self.spinner)}")
-            sys.stdout.flush()
-            time.sleep(self.delay)
-        self.show_cursor()
-
-    def start(self):
-        self.thread.start()
-
-    def stop(self):
-        self.stop_running = True
-        self.thread.join()
-        sys.stdout.write("\r" + " " * (len(self.message) + 2) + "\r")
-        sys.stdout.flush()
+THUNDERSTORE_PACKAGE_API = os.getenv(
+    "THUNDERSTORE_PACKAGE_API",
+    "https://thunderstore.io/api/experimental/package/"
+)
+USER_AGENT = "ElRaphik-Repo-Modpack-Updater/1.0"
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Per-package requests win while the manifest is a small share of the community index
+TARGETED_FETCH_MAX_SHARE = 0.05
+INDEX_PACKAGE_COUNT_ESTIMATE = 10000
+
+INDEX_CACHE_BODY = "index.json.gz"
+INDEX_CACHE_META = "meta.json"
+WATCH_HEARTBEAT_FILE = "heartbeat.json"
+
+# Separators between the elements of a JSON array
+ARRAY_SEPARATOR_RE = re.compile(r"[\s,]*")
+# No Thunderstore package comes close; past this the stream is not a package array
+MAX_INDEX_ELEMENT_SIZE = 16 * 1024 * 1024
+
+# Phase timings and counters of the current run
+METRICS = RunMetrics()
+# Set per worker thread when several packs are updated, so every line names its pack
+LOG_CONTEXT = threading.local()
 
 def center_text_if_possible(text):
     try:
@@ -103,96 +116,108 @@ def parse_args():
     parser.add_argument("--dry-run", action="store_true", default=os.getenv("DRY_RUN", "false").lower() == "true", help="Run without making any file changes")
     parser.add_argument("--force", action="store_true", default=os.getenv("FORCE", "false").lower() == "true", help="Force version bump even if nothing changed")
     parser.add_argument("--verbose", action="store_true", default=os.getenv("VERBOSE", "false").lower() == "true", help="More verbose output")
-    parser.add_argument("--no-issue", action="store_true", default=os.getenv("NO_ISSUE", "false").lower() == "true", help="Do not create GitHub issues for missing dependencies")
+    parser.add_argument("--no-issue", action="store_true", default=os.getenv("NO_ISSUE", "false").lower() == "true", help="Do not create or close GitHub issues for missing dependencies")
     parser.add_argument("--major-upgrade", action="store_true", default=os.getenv("MAJOR_UPGRADE", "false").lower() == "true", help="Force a major version bump (resets minor and patch)")
     parser.add_argument("--max-retries", type=int, default=int(os.getenv("THUNDERSTORE_MAX_RETRIES", 3)), help="Max retries for Thunderstore API requests")
-    parser.add_argument("--retry-delay", type=int, default=int(os.getenv("THUNDERSTORE_RETRY_DELAY", 5)), help="Delay between retries for Thunderstore API requests (seconds)")
+    parser.add_argument("--retry-delay", type=float, default=float(os.getenv("THUNDERSTORE_RETRY_DELAY", 2)), help="Base delay before retrying a Thunderstore request, doubled after every failed attempt (seconds)")
     parser.add_argument("--timeout-time", type=int, default=int(os.getenv("THUNDERSTORE_TIMEOUT_TIME", 10)), help="Timeout for Thunderstore API requests (seconds)")
+    parser.add_argument("--fetch-deadline", type=float, default=float(os.getenv("THUNDERSTORE_FETCH_DEADLINE", 300)), help="Stop retrying Thunderstore once a fetch has taken this long, retries included (seconds, 0 for no limit)")
+    parser.add_argument("--fetch-strategy", choices=["auto", "index", "targeted"], default=os.getenv("THUNDERSTORE_FETCH_STRATEGY", "auto"), help="Download the whole community index, query only the manifest packages, or pick automatically")
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("THUNDERSTORE_MAX_CONCURRENCY", 8)), help="Max parallel requests when querying packages one by one")
+    parser.add_argument("--resolve-transitive", action="store_true", default=os.getenv("RESOLVE_TRANSITIVE", "false").lower() == "true", help="Check the transitive dependencies of every manifest entry (needs the full index)")
+    parser.add_argument("--write-closure", action="store_true", default=os.getenv("WRITE_CLOSURE", "false").lower() == "true", help="Add missing transitive dependencies to the manifest (implies --resolve-transitive)")
+    parser.add_argument("--changelog-max-bytes", type=int, default=int(os.getenv("CHANGELOG_MAX_BYTES", 64 * 1024)), help="Archive older releases to CHANGELOG-<year>.md once CHANGELOG.md grows past this size (0 disables)")
+    parser.add_argument("--cache-dir", default=INDEX_CACHE_DIR, help="Directory holding the cached Thunderstore index")
+    parser.add_argument("--cache-ttl", type=int, default=int(os.getenv("THUNDERSTORE_CACHE_TTL", 300)), help="Use the cached Thunderstore index without revalidating it for this many seconds")
+    parser.add_argument("--no-cache", action="store_true", default=os.getenv("NO_CACHE", "false").lower() == "true", help="Always download the Thunderstore index and do not cache it")
+    parser.add_argument("--offline", action="store_true", default=os.getenv("OFFLINE", "false").lower() == "true", help="Only use the cached Thunderstore index, never hit the network")
+    parser.add_argument("--packs", nargs="+", default=os.getenv("MODPACKS", "").split() or None, help="Modpack directories or globs to update with a single index fetch (default: the current directory)")
+    parser.add_argument("--pack-workers", type=int, default=int(os.getenv("MODPACK_WORKERS", 4)), help="Modpacks updated in parallel")
+    parser.add_argument("--download-mods", action="store_true", default=os.getenv("DOWNLOAD_MODS", "false").lower() == "true", help="Download the mod zips of every pack into the local mod cache")
+    parser.add_argument("--mods-cache-dir", default=MOD_CACHE_DIR, help="Content-addressed cache of downloaded mod zips")
+    parser.add_argument("--assemble-dir", default=os.getenv("ASSEMBLE_DIR"), help="Assemble every pack with its mods into this directory (implies --download-mods)")
+    parser.add_argument("--assemble-zip", action="store_true", default=os.getenv("ASSEMBLE_ZIP", "false").lower() == "true", help="Assemble each pack as a zip instead of a directory")
+    parser.add_argument("--watch", action="store_true", default=os.getenv("WATCH", "false").lower() == "true", help="Keep running and poll the Thunderstore index, updating when a manifest package changes")
+    parser.add_argument("--watch-interval", type=int, default=int(os.getenv("WATCH_INTERVAL", 300)), help="Seconds between two polls in watch mode")
+    parser.add_argument("--heartbeat-file", default=os.getenv("WATCH_HEARTBEAT_FILE"), help=f"JSON file refreshed after every poll in watch mode (default: {WATCH_HEARTBEAT_FILE} in the cache directory)")
+    parser.add_argument("--no-release-notes", action="store_true", default=os.getenv("NO_RELEASE_NOTES", "false").lower() == "true", help="Do not add the release notes of updated mods to the changelog")
+    parser.add_argument("--release-notes-cache-dir", default=RELEASE_NOTES_CACHE_DIR, help="Directory caching the release notes of every mod version")
+    parser.add_argument("--release-notes-workers", type=int, default=int(os.getenv("RELEASE_NOTES_WORKERS", 8)), help="Release notes fetched in parallel")
+    parser.add_argument("--release-notes-deadline", type=float, default=float(os.getenv("RELEASE_NOTES_DEADLINE", 20)), help="Seconds to wait for release notes before writing the changelog without the missing ones")
+    parser.add_argument("--delta-json", default=os.getenv("INDEX_DELTA_JSON"), help="Write the packages that were added, updated, deprecated or removed on Thunderstore since the previous index download as JSON to this file ('-' for stdout; needs the full index)")
+    parser.add_argument("--metrics-json", default=os.getenv("METRICS_JSON"), help="Write phase timings and counters as JSON to this file ('-' for stdout)")
+    parser.add_argument("--profile", default=os.getenv("PROFILE_OUTPUT"), help="Write a cProfile dump of the run to this file")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    search_parser = commands.add_parser("search", help="Search the Thunderstore index and optionally add hits to the manifest (the options above go before 'search')")
+    search_parser.add_argument("query", nargs="+", help="Words to look for in package names, owners and descriptions; typos are tolerated")
+    search_parser.add_argument("--limit", type=int, default=int(os.getenv("SEARCH_LIMIT", 20)), help="Hits to show (0 for all)")
+    search_parser.add_argument("--sort", choices=SEARCH_SORTS, default=os.getenv("SEARCH_SORT", "relevance"), help="Rank by relevance (downloads and rating break ties), or by downloads or rating alone")
+    search_parser.add_argument("--min-similarity", type=float, default=SEARCH_MIN_SIMILARITY, help="Share of the query trigrams a package has to contain (0-1)")
+    search_parser.add_argument("--include-deprecated", action="store_true", help="Also show deprecated packages")
+    search_parser.add_argument("--include-nsfw", action="store_true", help="Also show packages flagged as NSFW")
+    search_parser.add_argument("--add", nargs="+", metavar="HIT", help="Add these hits to the manifest at their latest version, by their number in the results or their namespace-name")
+    search_parser.add_argument("--manifest", default=MANIFEST_PATH, help="Manifest the hits are added to")
     return parser.parse_args()
 
-def safe_run_subprocess(cmd):
-    try:
-        subprocess.run(cmd, check=True)
-        log_info(f"Command succeeded: {' '.join(cmd)}")
-    except subprocess.CalledProcessError:
-        log_error(f"Failed command: {' '.join(cmd)}")
-        sys.exit(1)
-
 def banner(title, filler="", color=Fore.WHITE, width=80, endline=False):
-    print("\n" + color + "="*width, flush=True)
-    print(f"{color}{title}\n", flush=True)
-    print(filler, flush=True)
-    if endline: print(color + "=" * width + Style.RESET_ALL, flush=True)
+    # One record, so banners from parallel packs do not interleave
+    lines = ["\n" + color + "=" * width, f"{color}{title}\n", filler]
+    if endline: lines.append(color + "=" * width + Style.RESET_ALL)
+    RENDERER.log("\n".join(line + Style.RESET_ALL for line in lines))
 
-def write_version_txt(version, dry_run=False):
-    if dry_run:
-        log_info("[Dry Run] Would write version.txt")
-        return
-    with open("version.txt", "w") as f:
-        f.write(version)
+def write_output(path, content, dry_run=False, output=None):
+    # Staged with the other files of the run when there is an output stage, otherwise committed on its own
+    if output is not None:
+        output.write(path, content)
+    elif commit_files({path: content}, dry_run=dry_run) and dry_run:
+        log_info(f"[Dry Run] Would update {path}")
 
-def log_info(message, spinner=None):
-    if spinner:
-        spinner.stop()
-        spinner = Spinner(message=spinner.message, delay=spinner.delay)
-    print(Fore.BLUE + message, flush=True)
-    if spinner:
-        spinner.start()
-        return spinner
-
-def log_warning(message, spinner=None):
-    if spinner:
-        spinner.stop()
-        spinner = Spinner(message=spinner.message, delay=spinner.delay)
-    print(Fore.YELLOW + message, flush=True)
-    if spinner:
-        spinner.start()
-        return spinner
-
-def log_error(message, spinner=None):
-    if spinner:
-        spinner.stop()
-        spinner = Spinner(message=spinner.message, delay=spinner.delay)
-    print(Fore.RED + message, flush=True)
-    if spinner:
-        spinner.start()
-        return spinner
+def write_version_txt(version, dry_run=False, path="version.txt", output=None):
+    write_output(path, version, dry_run=dry_run, output=output)
 
-def update_changelog(new_version, added_mods: list, updated_mods, removed_mods, thunderstore_lookup, dry_run=False):
+def log_prefix():
+    return getattr(LOG_CONTEXT, "prefix", "")
+
+def log_info(message):
+    RENDERER.log(Fore.BLUE + log_prefix() + message)
+
+def log_warning(message):
+    RENDERER.log(Fore.YELLOW + log_prefix() + message)
+
+def log_error(message):
+    RENDERER.log(Fore.RED + log_prefix() + message)
+
+def changelog_link(change):
+    if change.package_url:
+        return f"[{change.full_name}]({change.package_url})"
+    return change.full_name
+
+def update_changelog(new_version, changes, dry_run=False, max_bytes=0, path="CHANGELOG.md", output=None, notes=None):
     today = date.today().isoformat()
     changelog_entry = f"## v{new_version} - {today}\n\n"
 
     sections_written = False
 
-    if added_mods:
-        changelog_entry += f"<details>\n<summary>📦 Added ({len(added_mods)} mods)</summary>\n\n"
-        for mod in sorted(added_mods):
-            namespace, name = mod.split("-", 2)
-            full_mod_name = f"{namespace}-{name}"
-            package_url = thunderstore_lookup.get(full_mod_name).get("package_url")
-            changelog_entry += f"- [{namespace}-{name}]({package_url})\n"
+    if changes.added:
+        changelog_entry += f"<details>\n<summary>📦 Added ({len(changes.added)} mods)</summary>\n\n"
+        for change in changes.added:
+            changelog_entry += f"- {changelog_link(change)}\n"
         changelog_entry += "</details>\n\n"
         sections_written = True
 
-    if updated_mods:
-        changelog_entry += f"<details>\n<summary>🔄 Updated ({len(updated_mods)} mods)</summary>\n\n"
-        for mod in sorted(updated_mods):
-            parts = mod.split(" (")
-            namespace_name = parts[0]
-            namespace, name = namespace_name.split("-", 1)
-            full_mod_name = f"{namespace}-{name}"
-            package_url = thunderstore_lookup.get(full_mod_name).get("package_url")
-            changelog_entry += f"- [{namespace}-{name}]({package_url}) ({parts[1]}\n" # Is correct because parts[1] already includes the closing )
+    if changes.updated:
+        changelog_entry += f"<details>\n<summary>🔄 Updated ({len(changes.updated)} mods)</summary>\n\n"
+        for change in changes.updated:
+            changelog_entry += f"- {changelog_link(change)} ({change.old_version} → {change.new_version})\n"
+            if notes and change.full_name in notes:
+                changelog_entry += f"\n{notes[change.full_name]}\n"
         changelog_entry += "</details>\n\n"
         sections_written = True
 
-    if removed_mods:
-        changelog_entry += f"<details>\n<summary>❌ Removed ({len(removed_mods)} mods)</summary>\n\n"
-        for mod in sorted(removed_mods):
-            namespace, name = mod.split("-", 2)
-            full_mod_name = f"{namespace}-{name}"
-            package_url = thunderstore_lookup.get(full_mod_name).get("package_url")
-            changelog_entry += f"- [{namespace}-{name}]({package_url})\n"
+    if changes.removed:
+        changelog_entry += f"<details>\n<summary>❌ Removed ({len(changes.removed)} mods)</summary>\n\n"
+        for change in changes.removed:
+            changelog_entry += f"- {changelog_link(change)}\n"
         changelog_entry += "</details>\n\n"
         sections_written = True
 
@@ -202,32 +227,30 @@ def update_changelog(new_version, added_mods: list, updated_mods, removed_mods,
     changelog_entry = changelog_entry.rstrip("\n") + "\n\n"
 
     if dry_run:
-        banner("[Dry Run] Would update CHANGELOG.md with:", filler=changelog_entry)
+        banner(f"[Dry Run] {log_prefix()}Would update {path} with:", filler=changelog_entry)
         return
 
-    try:
-        with open("CHANGELOG.md", "r") as f:
-            existing_changelog = f.read()
-    except FileNotFoundError:
-        existing_changelog = ""
-
-    with open("CHANGELOG.md", "w") as f:
-        f.write(changelog_entry + existing_changelog)
-
-    log_info("CHANGELOG.md updated.")
+    if output is not None:
+        archived = prepend_changelog(changelog_entry, output, path=path, max_bytes=max_bytes)
+    else:
+        with OutputStage(os.path.dirname(path)) as output:
+            archived = prepend_changelog(changelog_entry, output, path=path, max_bytes=max_bytes)
+    for archive in archived:
+        log_info(f"Older releases of {path} go to {archive}.")
 
 def load_snapshot(path):
+    # The entries and the index generation they were checked against, None when unknown
     if os.path.exists(path):
         with open(path, 'r') as f:
-            return json.load(f)
-    return []
+            raw = json.load(f)
+        return snapshot_entries(raw), snapshot_generation(raw)
+    return {}, None
 
-def save_snapshot(path, dependencies, dry_run=False):
-    if dry_run:
-        log_info(f"[Dry Run] Would update snapshot {path}")
-        return
-    with open(path, 'w') as f:
-        json.dump(dependencies, f, indent=4)
+def save_snapshot(path, entries, dry_run=False, output=None, generation=None):
+    data = {"format": SNAPSHOT_FORMAT, "dependencies": entries}
+    if generation:
+        data["index"] = generation
+    write_output(path, json.dumps(data, indent=4, sort_keys=True), dry_run=dry_run, output=output)
 
 def color_bumped_version(old_version, new_version):
     old_parts = old_version.split(".")
@@ -250,7 +273,7 @@ def color_bumped_version(old_version, new_version):
 
     return ".".join(result)
 
-def bump_version(current_version, added_mods, updated_mods, removed_mods, force_major_upgrade=False):
+def bump_version(current_version, changes, force_major_upgrade=False):
     if current_version == "":
         return "1.0.0"
 
@@ -266,10 +289,10 @@ def bump_version(current_version, added_mods, updated_mods, removed_mods, force_
         major += 1
         minor = 0
         patch = 0
-    elif added_mods or removed_mods:
+    elif changes.names_changed:
         minor += 1
         patch = 0
-    elif updated_mods:
+    elif changes.has_updates:
         patch += 1
     else:
         # No change needed if no mods at all, but return current
@@ -281,207 +304,1032 @@ def load_manifest(path):
     with open(path, 'r') as f:
         return json.load(f)
 
-def save_manifest(path, data, dry_run=False):
-    if dry_run:
-        log_info(f"[Dry Run] Would update manifest {path}")
-        return
+def save_manifest(path, data, dry_run=False, output=None):
     unique_dependencies = list(dict.fromkeys(sorted(data.get("dependencies", []))))
     data["dependencies"] = unique_dependencies
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
+    write_output(path, json.dumps(data, indent=4), dry_run=dry_run, output=output)
+
+def iter_json_array_items(chunks):
+    # Decode the elements of a streamed JSON array one at a time, so only the current element
+    # and the unread tail of the last chunk are ever held in memory
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    opened = False
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buffer += text_decoder.decode(b"" if final else chunk, final=final)
+        while True:
+            position = ARRAY_SEPARATOR_RE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != "[":
+                    raise ValueError("Thunderstore index is not a JSON array")
+                opened = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element goes on in the next chunk
+                if final or len(buffer) - position > MAX_INDEX_ELEMENT_SIZE:
+                    raise
+                break
+            yield item
+        buffer = buffer[position:]
+        position = 0
+    raise ValueError("Thunderstore index ended before the closing bracket")
+
+def dependency_names(dependencies):
+    return {"-".join(dep.split("-")[:2]) for dep in dependencies}
+
+def write_file_atomic(path, data, mode="w"):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def load_index_cache_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_CACHE_META), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("url") != THUNDERSTORE_API or not os.path.exists(os.path.join(cache_dir, INDEX_CACHE_BODY)):
+        return None
+    return meta
+
+def save_index_cache_meta(cache_dir, meta):
+    write_file_atomic(os.path.join(cache_dir, INDEX_CACHE_META), json.dumps(meta, indent=4))
+
+def iter_cached_index(cache_dir):
+    with gzip.open(os.path.join(cache_dir, INDEX_CACHE_BODY), "rb") as f:
+        while chunk := f.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+def tee_to_gzip(chunks, path):
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+
+def package_record(package, versions):
+    # One package reduced to the INDEX_STORE_COLUMNS values; versions is every release, latest first.
+    # The digest leaves out the release list so the per-package API, which only returns the latest, agrees with the index
+    latest = versions[0]
+    record = (
+        latest["version_number"],
+        package.get("package_url", ""),
+        " ".join(latest.get("dependencies", [])),
+        latest.get("download_url", ""),
+        " ".join(sort_versions(entry["version_number"] for entry in versions)),
+        package.get("date_updated", "")
+    )
+    digest = hashlib.sha1("\0".join(record[:4] + record[5:]).encode("utf-8")).hexdigest()
+    return record + (digest, "1" if package.get("is_deprecated") else "")
+
+def build_lookup(chunks, wanted=None):
+    lookup = {}
+    parsed = 0
+    for package in iter_json_array_items(chunks):
+        parsed += 1
+        full_name = package.get("full_name")
+        if wanted is not None and full_name not in wanted:
+            continue
+        if full_name:
+            lookup[full_name] = dict(zip(INDEX_STORE_COLUMNS, package_record(package, package.get("versions", []))))
+        # Every package we care about has been seen, the rest of the index is irrelevant
+        if wanted is not None and len(lookup) == len(wanted):
+            break
+    return lookup, parsed
+
+def stream_index_store(chunks, store_path, meta=None):
+    # Every package of the index goes straight into a new store and is compared on the way with the previous one,
+    # so memory does not grow with the community. The previous store stays in place when nothing changed.
+    # The delta is only worked out against a store of the same index URL, which is what meta vouches for.
+    # Returns (packages parsed, packages changed, delta)
+    previous = open_index_store(store_path)
+    # A store that cannot be compared against is always replaced
+    replace = previous is None
+    builder = IndexDeltaBuilder(INDEX_STORE_COLUMNS, base=meta.get("generation") if meta else None, compare=meta is not None and previous is not None)
+    parsed = 0
+    changed = 0
+    try:
+        with IndexStoreWriter(store_path) as writer:
+            for package in iter_json_array_items(chunks):
+                parsed += 1
+                full_name = package.get("full_name")
+                versions = package.get("versions")
+                if not full_name or not versions:
+                    continue
+                record = package_record(package, versions)
+                writer.add(full_name, record)
+                old = previous.row(full_name) if previous is not None else None
+                if old != record:
+                    changed += 1
+                builder.add(full_name, record, old)
+            writer.finish()
+            if previous is not None:
+                with IndexStore(writer.tmp_path) as current:
+                    for name in previous:
+                        if name not in current:
+                            changed += 1
+                            builder.remove(name, previous.value(name, "version"))
+                previous.close()
+                previous = None
+            if changed or replace:
+                writer.commit()
+            else:
+                writer.discard()
+    finally:
+        if previous is not None:
+            previous.close()
+    return parsed, changed, builder.finish()
+
+def lookup_from_cache(cache_dir):
+    store_path = os.path.join(cache_dir, INDEX_STORE_FILE)
+    store = open_index_store(store_path)
+    if store is not None:
+        return store
+    # Store missing or written with other columns: rebuild it from the local copy, no download needed
+    parsed, _, _ = stream_index_store(iter_cached_index(cache_dir), store_path)
+    METRICS.count("packages_parsed", parsed)
+    return IndexStore(store_path)
+
+def index_generation(cache_dir):
+    meta = load_index_cache_meta(cache_dir) if cache_dir else None
+    return meta.get("generation") if meta else None
+
+def current_index_delta(cache_dir, thunderstore_lookup):
+    # Only a lookup read from the index store is the generation the cached delta leads to
+    if not cache_dir or not isinstance(thunderstore_lookup, IndexStore):
+        return None
+    return load_index_delta(cache_dir, index_generation(cache_dir))
+
+def emit_index_delta(path, delta, generation_before):
+    # The changes this run downloaded; an index that did not change since the last run gives an empty delta
+    if delta is None:
+        log_warning(f"No index delta to write to {path}: it needs the cached community index.")
+        return
+    if delta.generation == generation_before:
+        delta = IndexDelta(delta.generation, delta.generation)
+    try:
+        write_index_delta(path, delta)
+    except OSError as e:
+        log_warning(f"Could not write the index delta: {e}")
 
-def fetch_thunderstore_packages(max_retries, retry_delay, timeout_time, verbose=False):
+def fetch_thunderstore_packages(max_retries, retry_delay, timeout_time, verbose=False, wanted=None, cache_dir=None, cache_ttl=0, offline=False, deadline=None):
+    # Raises DownloadError once the retries or the deadline are used up
     spinner = Spinner(message="🔄 Fetching Thunderstore packages... ")
     spinner.start()
     try:
-        for attempt in range(1, max_retries + 1):
-            try:
-                resp = requests.get(THUNDERSTORE_API, headers={"User-Agent": "ElRaphik-Repo-Modpack-Updater/1.0"}, timeout=timeout_time)
-                resp.raise_for_status()
-                packages = resp.json()
-                lookup = {}
-                for package in packages:
-                    full_name = package.get("full_name")
-                    versions = package.get("versions", [])
-                    package_url = package.get("package_url", "")
-                    if full_name:
-                        lookup[full_name] = {
-                            "version": versions[0]["version_number"],
-                            "package_url": package_url
-                        }
-                if verbose:
-                    spinner = log_info(f"Loaded {len(lookup)} packages from Thunderstore.", spinner=spinner)
-                return lookup
-            except requests.RequestException as e:
-                log_warning(f"Attempt {attempt} failed: {e}")
-                if attempt < max_retries:
-                    spinner = log_info(f"Retrying in {retry_delay} seconds...", spinner=spinner)
-                    time.sleep(retry_delay)
-                else:
-                    spinner = log_error("❌ Failed to fetch Thunderstore packages after multiple attempts.", spinner=spinner)
-                    sys.exit(1)
+        meta = load_index_cache_meta(cache_dir) if cache_dir else None
+        if offline:
+            if meta is None:
+                raise DownloadError(f"--offline requested but no cached Thunderstore index found in {cache_dir}")
+            if verbose:
+                log_info("Offline mode: using cached Thunderstore index.")
+            METRICS.count("cache_hits")
+            return lookup_from_cache(cache_dir)
+        if meta is not None and time.time() - meta["fetched_at"] < cache_ttl:
+            if verbose:
+                log_info(f"Using cached Thunderstore index ({int(time.time() - meta['fetched_at'])}s old).")
+            METRICS.count("cache_hits")
+            return lookup_from_cache(cache_dir)
+
+        headers = {"User-Agent": USER_AGENT}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        policy = RetryPolicy(max_retries, retry_delay, deadline, warn=log_warning)
+        with requests.Session() as session:
+            for attempt in itertools.count(1):
+                try:
+                    # Dropped transfers resume where they stopped; only a changed index starts over
+                    with ResumableDownload(session, THUNDERSTORE_API, headers, timeout_time, policy, count_bytes=lambda n: METRICS.count("bytes_downloaded", n)) as resp:
+                        if resp.status_code == 304 and meta is not None:
+                            meta["fetched_at"] = time.time()
+                            save_index_cache_meta(cache_dir, meta)
+                            if verbose:
+                                log_info("Thunderstore index not modified, using cached copy.")
+                            METRICS.count("cache_hits")
+                            return lookup_from_cache(cache_dir)
+                        resp.raise_for_status()
+
+                        chunks = resp.iter_content(STREAM_CHUNK_SIZE)
+                        if cache_dir:
+                            # The whole community goes into the cache and the index store, so nothing is filtered here
+                            os.makedirs(cache_dir, exist_ok=True)
+                            body_tmp_path = os.path.join(cache_dir, f"{INDEX_CACHE_BODY}.tmp")
+                            store_path = os.path.join(cache_dir, INDEX_STORE_FILE)
+                            parsed, changed, delta = stream_index_store(tee_to_gzip(chunks, body_tmp_path), store_path, meta)
+                            os.replace(body_tmp_path, os.path.join(cache_dir, INDEX_CACHE_BODY))
+                            save_index_delta(cache_dir, delta)
+                            # Written last: the delta only counts once the meta names its generation
+                            save_index_cache_meta(cache_dir, {
+                                "url": THUNDERSTORE_API,
+                                "etag": resp.headers.get("ETag"),
+                                "last_modified": resp.headers.get("Last-Modified"),
+                                "fetched_at": time.time(),
+                                "package_count": parsed,
+                                "generation": delta.generation
+                            })
+                            lookup = IndexStore(store_path)
+                            if verbose:
+                                log_info(f"Index store refreshed, {changed} packages changed.")
+                                if delta:
+                                    log_info(f"Since the last download: {len(delta.new)} new, {len(delta.updated)} updated, {len(delta.deprecated)} deprecated, {len(delta.removed)} removed.")
+                        else:
+                            lookup, parsed = build_lookup(chunks, wanted)
+                        METRICS.count("packages_parsed", parsed)
+                    if verbose:
+                        log_info(f"Loaded {len(lookup)} packages from Thunderstore ({parsed} scanned).")
+                        if wanted is not None:
+                            for full_name in sorted(name for name in wanted if name not in lookup):
+                                log_warning(f"Not in Thunderstore index: {full_name}")
+                    return lookup
+                except (requests.RequestException, ValueError) as e:
+                    # Could not be resumed or did not parse: the next attempt downloads the index from scratch
+                    policy.wait(attempt, e)
     finally:
         spinner.stop()
 
-def create_github_issue(mod_full_name, no_issue=False):
+def choose_fetch_strategy(strategy, wanted, cache_dir, cache_ttl, offline):
+    if offline or wanted is None:
+        return "index"
+    if strategy != "auto":
+        return strategy
+    meta = load_index_cache_meta(cache_dir) if cache_dir else None
+    if meta is not None and time.time() - meta["fetched_at"] < cache_ttl:
+        return "index"
+    package_count = meta.get("package_count", INDEX_PACKAGE_COUNT_ESTIMATE) if meta else INDEX_PACKAGE_COUNT_ESTIMATE
+    return "targeted" if len(wanted) <= package_count * TARGETED_FETCH_MAX_SHARE else "index"
+
+def fetch_package(session, full_name, policy, timeout_time):
+    namespace, name = full_name.split("-", 1)
+    url = f"{THUNDERSTORE_PACKAGE_API}{namespace}/{name}/"
+    for attempt in itertools.count(1):
+        try:
+            resp = session.get(url, timeout=timeout_time)
+            METRICS.count("bytes_downloaded", len(resp.content))
+            if resp.status_code == 404:
+                return full_name, None
+            if resp.status_code in RETRY_STATUSES:
+                error = requests.HTTPError(f"{resp.status_code} {resp.reason} for {url}", response=resp)
+                policy.wait(attempt, error, parse_retry_after(resp.headers.get("Retry-After")))
+                continue
+            resp.raise_for_status()
+            package = resp.json()
+            METRICS.count("packages_parsed")
+            # The per-package API only returns the latest release
+            return full_name, dict(zip(INDEX_STORE_COLUMNS, package_record(package, [package["latest"]])))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            policy.wait(attempt, e)
+
+def fetch_targeted_packages(wanted, max_retries, retry_delay, timeout_time, max_concurrency, verbose=False, deadline=None):
+    spinner = Spinner(message=f"🔄 Fetching {len(wanted)} Thunderstore packages... ")
+    spinner.start()
+    try:
+        lookup = {}
+        # Shared by the workers, so a throttled API slows all of them down and the deadline covers the batch
+        policy = RetryPolicy(max_retries, retry_delay, deadline)
+        with requests.Session() as session:
+            session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                results = pool.map(lambda full_name: fetch_package(session, full_name, policy, timeout_time), sorted(wanted))
+                for done, (full_name, package) in enumerate(results, 1):
+                    spinner.update(done, len(wanted))
+                    if package is None:
+                        if verbose:
+                            log_warning(f"Not on Thunderstore: {full_name}")
+                        continue
+                    lookup[full_name] = package
+        if verbose:
+            log_info(f"Loaded {len(lookup)} packages from Thunderstore ({len(wanted)} requested).")
+        return lookup
+    except (DownloadError, requests.RequestException, ValueError, KeyError) as e:
+        log_warning(f"Per-package fetch failed ({e}), falling back to the full index.")
+        return None
+    finally:
+        spinner.stop()
+
+def wait_for_rate_limit(resp):
+    # Seconds to wait before the next GitHub call, None when the response carries no rate-limit hint.
+    # Retry-After may be seconds or an HTTP date, like on Thunderstore
+    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+    if retry_after is not None:
+        return retry_after
+    if resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return max(0, int(resp.headers["X-RateLimit-Reset"]) - time.time())
+        except (KeyError, ValueError):
+            return None
+    return None
+
+def github_request(session, method, url, max_retries=3, **kwargs):
+    for attempt in range(1, max_retries + 1):
+        resp = session.request(method, url, **kwargs)
+        wait = wait_for_rate_limit(resp)
+        if wait is None:
+            return resp
+        wait = min(wait, GITHUB_MAX_RATE_LIMIT_WAIT)
+        if resp.status_code in (403, 429):
+            if attempt == max_retries:
+                return resp
+            log_warning(f"GitHub rate limit hit, retrying in {wait:.0f} seconds...")
+            time.sleep(wait)
+            continue
+        # Request went through but the budget is spent: hold the next one until it resets
+        if resp.headers.get("X-RateLimit-Remaining") == "0":
+            log_warning(f"GitHub rate limit exhausted, waiting {wait:.0f} seconds...")
+            time.sleep(wait)
+        return resp
+    return resp
+
+def fetch_open_issues(session, cache_path=None):
+    # Pages are revalidated with their ETag; GitHub does not count 304 answers against the rate limit
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path, "r") as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            cache = {}
+
+    pages = {}
+    issues = []
+    url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/issues?state=open&per_page=100"
+    while url:
+        cached = cache.get(url)
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        resp = github_request(session, "GET", url, headers=headers)
+        if resp.status_code == 304 and cached:
+            page = cached
+        else:
+            resp.raise_for_status()
+            page = {
+                "etag": resp.headers.get("ETag"),
+                "next": resp.links.get("next", {}).get("url"),
+                "issues": [{"number": issue["number"], "title": issue["title"]} for issue in resp.json() if "pull_request" not in issue]
+            }
+        pages[url] = page
+        issues.extend(page["issues"])
+        url = page["next"]
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        write_file_atomic(cache_path, json.dumps(pages))
+    return issues
+
+def sync_github_issues(missing, no_issue=False, dry_run=False, cache_dir=None, verbose=False):
     if no_issue:
-        log_warning(f"Skipping issue creation for {mod_full_name} due to --no-issue flag.")
+        if missing:
+            log_warning(f"Skipping issue sync for {len(missing)} missing dependencies due to --no-issue flag.")
         return
     if not GITHUB_TOKEN or not GITHUB_REPO:
-        log_warning("Missing GitHub token or repo. Cannot create issue.")
+        log_warning("Missing GitHub token or repo. Cannot sync issues.")
         return
 
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/issues"
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json"
-    }
-    data = {
-        "title": f"Dependency not found: {mod_full_name}",
-        "body": f"The dependency `{mod_full_name}` could not be found on Thunderstore. Please investigate."
-    }
-    resp = requests.post(url, headers=headers, json=data)
-    if resp.status_code != 201:
-        log_error(f"Failed to create issue: {resp.text}")
-
-def process_dependencies(dependencies, thunderstore_lookup, args):
-    updated = False
-    new_dependencies = []
-    updated_mods = []
-
-    spinner = Spinner(message="🔄 Processing dependencies... ")
-    spinner.start()
+    missing_by_name = {"-".join(dep.split("-")[:2]): dep for dep in missing}
+    with requests.Session() as session:
+        session.headers.update({
+            "Authorization": f"Bearer {GITHUB_TOKEN}",
+            "Accept": "application/vnd.github+json",
+            "User-Agent": USER_AGENT
+        })
+        try:
+            open_issues = fetch_open_issues(session, os.path.join(cache_dir, GITHUB_ISSUES_CACHE) if cache_dir else None)
+        except requests.RequestException as e:
+            log_error(f"Failed to fetch open issues: {e}")
+            return
+
+        issues_by_name = {}
+        for issue in sorted(open_issues, key=lambda issue: issue["number"]):
+            if issue["title"].startswith(MISSING_ISSUE_PREFIX):
+                name = "-".join(issue["title"][len(MISSING_ISSUE_PREFIX):].split("-")[:2])
+                issues_by_name.setdefault(name, []).append(issue)
+
+        to_create = [dep for name, dep in sorted(missing_by_name.items()) if name not in issues_by_name]
+        to_close = []
+        for name, issues in sorted(issues_by_name.items()):
+            # Earlier runs filed one issue per run: keep the oldest while the mod is still missing
+            for issue in issues[1:] if name in missing_by_name else issues:
+                to_close.append((issue, "not_planned" if name in missing_by_name else "completed"))
+
+        if verbose:
+            log_info(f"Issue sync: {len(open_issues)} open issues, {len(to_create)} to create, {len(to_close)} to close.")
+        if dry_run:
+            for dep in to_create:
+                log_info(f"[Dry Run] Would create issue for {dep}")
+            for issue, _ in to_close:
+                log_info(f"[Dry Run] Would close issue #{issue['number']} ({issue['title']})")
+            return
+
+        issues_url = f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/issues"
+        for dep in to_create:
+            data = {
+                "title": f"{MISSING_ISSUE_PREFIX}{dep}",
+                "body": f"The dependency `{dep}` could not be found on Thunderstore. Please investigate."
+            }
+            resp = github_request(session, "POST", issues_url, json=data)
+            if resp.status_code != 201:
+                log_error(f"Failed to create issue for {dep}: {resp.text}")
+        for issue, reason in to_close:
+            resp = github_request(session, "PATCH", f"{issues_url}/{issue['number']}", json={"state": "closed", "state_reason": reason})
+            if resp.status_code != 200:
+                log_error(f"Failed to close issue #{issue['number']}: {resp.text}")
+
+def lookup_digest(thunderstore_lookup, full_name):
+    # The index store decodes the one column instead of the whole row
+    if isinstance(thunderstore_lookup, IndexStore):
+        return thunderstore_lookup.value(full_name, "digest")
+    package = thunderstore_lookup.get(full_name)
+    return package.get("digest") if package else None
+
+def process_dependencies(dependencies, snapshot, thunderstore_lookup, args, show_progress=True, constraints=None, changed=None):
+    # changed: the packages the index delta says may differ from the generation the snapshot was checked against,
+    # None when the delta does not reach back that far and every entry's digest is compared instead
+    changes = ChangeSet(snapshot)
+
+    # Parallel packs share one spinner drawn by the caller
+    spinner = Spinner(message="🔄 Processing dependencies... ") if show_progress else None
+    if spinner: spinner.start()
 
     try:
-        for dep in dependencies:
-            if args.verbose: spinner = log_info(f"Treating dependency: {dep}", spinner=spinner)
-            try:
-                namespace, name, current_version = dep.split("-")
-                full_mod_name = f"{namespace}-{name}"
-            except ValueError:
-                spinner = log_warning(f"Skipping malformed dependency: {dep}", spinner=spinner)
-                new_dependencies.append(dep)
+        for done, dep in enumerate(dependencies, 1):
+            if spinner: spinner.update(done, len(dependencies))
+            if args.verbose: log_info(f"Treating dependency: {dep}")
+            parsed = parse_dependency(dep)
+            if parsed is None:
+                log_warning(f"Skipping malformed dependency: {dep}")
+                changes.add_malformed(dep)
+                continue
+            full_mod_name, current_version = parsed
+            constraint = constraints.get(full_mod_name) if constraints else None
+
+            # Same version and constraint as last run and an unchanged index entry: the last verdict still holds
+            previous = snapshot.get(full_mod_name)
+            if (previous and previous.get("digest") and previous["version"] == current_version
+                    and previous.get("constraint") == (str(constraint) if constraint is not None else None)
+                    and (full_mod_name not in changed if changed is not None
+                         else previous["digest"] == lookup_digest(thunderstore_lookup, full_mod_name))):
+                METRICS.count("deps_reused")
+                changes.keep(full_mod_name, current_version, previous.get("package_url"))
+                changes.records[full_mod_name] = previous
                 continue
 
-            latest = thunderstore_lookup.get(full_mod_name).get("version")
+            METRICS.count("deps_evaluated")
+            package = thunderstore_lookup.get(full_mod_name)
+
+            if package is None:
+                log_warning(f"Dependency not found: {dep}")
+                changes.missing.append(dep)
+                changes.keep(full_mod_name, current_version)
+                continue
 
-            if latest is None:
-                spinner = log_warning(f"Dependency not found: {dep}", spinner=spinner)
-                create_github_issue(dep, no_issue=args.no_issue)
-                new_dependencies.append(dep)
+            if constraint is None:
+                target = package["version"]
+                if is_newer(target, current_version):
+                    log_info(f"Updating {dep} to version {target}")
+                    changes.update(full_mod_name, current_version, target, package.get("package_url"))
+                else:
+                    target = current_version
+                    changes.keep(full_mod_name, current_version, package.get("package_url"))
+                changes.records[full_mod_name] = snapshot_record(target, package)
                 continue
 
-            if version.parse(latest) > version.parse(current_version):
-                spinner = log_info(f"Updating {dep} to version {latest}", spinner=spinner)
-                updated = True
-                new_dep = f"{namespace}-{name}-{latest}"
-                new_dependencies.append(new_dep)
-                updated_mods.append(f"{namespace}-{name} ({current_version} → {latest})")
+            target = best_version(package.get("versions") or package["version"], constraint)
+            if target is None:
+                log_warning(f"No release of {full_mod_name} satisfies {constraint}, keeping {current_version}")
+                target = current_version
+                changes.keep(full_mod_name, current_version, package.get("package_url"))
+            elif target != current_version and (is_newer(target, current_version) or not constraint.contains(current_version, prereleases=True)):
+                # A constraint can also move a mod back, e.g. after pinning below a broken major release
+                log_info(f"Updating {dep} to version {target} (constraint {constraint})")
+                changes.update(full_mod_name, current_version, target, package.get("package_url"))
             else:
-                new_dependencies.append(dep)
+                target = current_version
+                changes.keep(full_mod_name, current_version, package.get("package_url"))
+            changes.records[full_mod_name] = snapshot_record(target, package, constraint)
     finally:
-        spinner.stop()
-
-    return updated, new_dependencies, updated_mods
-
-def main(args):
-    start_time = time.time()
-    init(autoreset=True)
-
-    print_ascii_logo()
-    announce_mode(args.dry_run)
+        if spinner: spinner.stop()
+
+    return changes
+
+def check_transitive_dependencies(dependencies, graph, args):
+    report = resolve_dependencies(graph, dependencies)
+    if args.verbose:
+        log_info(f"Resolved {len(report.order)} packages from {len(graph)} known to the index.")
+
+    for name, versions in sorted(report.duplicates.items()):
+        log_warning(f"Duplicate dependency: {name} listed as {', '.join(versions)}")
+    for name, required_by in sorted(report.unknown.items()):
+        log_warning(f"Transitive dependency not on Thunderstore: {name} (required by {', '.join(sorted(required_by))})")
+    for name, shipped, required, required_by in report.conflicts:
+        log_warning(f"Version conflict: {name}-{shipped} but {required_by} requires >= {required}")
+    for cycle in report.cycles:
+        log_warning(f"Dependency cycle: {' → '.join(cycle)}")
+
+    closure = []
+    for name, required_by in sorted(report.unlisted.items()):
+        latest = graph.latest_version(name)
+        if args.write_closure:
+            log_info(f"Adding transitive dependency {name}-{latest} (required by {', '.join(sorted(required_by))})")
+        else:
+            log_warning(f"Transitive dependency not in manifest: {name} (required by {', '.join(sorted(required_by))})")
+        closure.append((name, latest))
+    return closure
 
+def load_pack(pack):
     try:
-        manifest = load_manifest(MANIFEST_PATH)
+        manifest = load_manifest(pack.manifest_path)
     except json.JSONDecodeError:
-        log_error(f"❌ Error: {MANIFEST_PATH} is not valid JSON. Please fix it before continuing.")
+        log_error(f"❌ Error: {pack.manifest_path} is not valid JSON. Please fix it before continuing.")
         sys.exit(1)
+    try:
+        constraints = parse_constraints(load_constraints(pack.constraints_path), pack.constraints_path)
+    except (json.JSONDecodeError, ValueError) as e:
+        log_error(f"❌ Error: {pack.constraints_path} is not usable: {e}")
+        sys.exit(1)
+    snapshot, generation = load_snapshot(pack.snapshot_path)
+    return manifest, snapshot, constraints, generation
+
+def load_thunderstore_lookup(args, wanted, cache_dir, needs_index=False):
+    # Constraints need every release of a package and the delta every package, which only the full index has
+    thunderstore_lookup = None
+    if not needs_index and choose_fetch_strategy(args.fetch_strategy, wanted, cache_dir, args.cache_ttl, args.offline) == "targeted":
+        thunderstore_lookup = fetch_targeted_packages(
+            wanted,
+            max_retries=args.max_retries,
+            retry_delay=args.retry_delay,
+            timeout_time=args.timeout_time,
+            max_concurrency=args.max_concurrency,
+            verbose=args.verbose,
+            deadline=args.fetch_deadline
+        )
+    if thunderstore_lookup is None:
+        try:
+            thunderstore_lookup = fetch_thunderstore_packages(
+                max_retries=args.max_retries,
+                retry_delay=args.retry_delay,
+                timeout_time=args.timeout_time,
+                verbose=args.verbose,
+                wanted=wanted,
+                cache_dir=cache_dir,
+                cache_ttl=args.cache_ttl,
+                offline=args.offline,
+                deadline=args.fetch_deadline
+            )
+        except DownloadError as e:
+            log_error(f"❌ Failed to fetch Thunderstore packages: {e}")
+            sys.exit(1)
+    return thunderstore_lookup
+
+def update_pack(pack, manifest, snapshot, constraints, generation, thunderstore_lookup, graph, args, label="", delta=None):
+    # Returns the change set with the version before and after; new_version is None when nothing was written
+    LOG_CONTEXT.prefix = label
+    try:
+        dependencies = manifest.get("dependencies", [])
+        current_version = manifest.get("version_number", "")
 
-    dependencies = manifest.get("dependencies", [])
-    added_mods = []
-    removed_mods = []
-
-    thunderstore_lookup = fetch_thunderstore_packages(
-        max_retries=args.max_retries,
-        retry_delay=args.retry_delay,
-        timeout_time=args.timeout_time,
-        verbose=args.verbose
-    )
-
-    updated, new_dependencies, updated_mods = process_dependencies(dependencies, thunderstore_lookup, args)
-
-    snapshot_dependencies = load_snapshot(SNAPSHOT_PATH)
-
-    snapshot_names = {"-".join(dep.split("-")[:2]) for dep in snapshot_dependencies}
-    current_names = {"-".join(dep.split("-")[:2]) for dep in new_dependencies}
-
-    if current_names != snapshot_names:
-        log_info("Dependencies list changed (mod added or removed).")
-        updated = True
-
-        snapshot_set = set(snapshot_names)
-        current_set = set(current_names)
-
-        added = current_set - snapshot_set
-        removed = snapshot_set - current_set
-
-        for mod in added:
-            added_mods.append(mod)
-
-        for mod in removed:
-            removed_mods.append(mod)
-
-    filtered_updated_mods = []
-    if updated or args.force:
+        changed = delta.changed_since(generation) if delta is not None else None
+        with METRICS.phase("process"):
+            changes = process_dependencies(dependencies, snapshot, thunderstore_lookup, args, show_progress=not label, constraints=constraints, changed=changed)
+
+        if graph is not None:
+            with METRICS.phase("transitive"):
+                closure = check_transitive_dependencies(changes.dependencies, graph, args)
+                if args.write_closure:
+                    for name, latest in closure:
+                        changes.keep(name, latest, thunderstore_lookup.get(name, {}).get("package_url"))
+
+        with METRICS.phase("process"):
+            changes.finish(thunderstore_lookup)
+        if changes.names_changed:
+            log_info("Dependencies list changed (mod added or removed).")
+
+        if not (changes or args.force):
+            log_info("All dependencies are up to date. No changes, skipping thunderstore.toml regeneration.")
+            if changes.next_snapshot != snapshot:
+                # Index entries moved without a release to ship; recorded so the next run can skip them again
+                save_snapshot(pack.snapshot_path, changes.next_snapshot, dry_run=args.dry_run, generation=delta.generation if delta is not None else None)
+            return changes, current_version, None
+
+        new_dependencies = changes.dependencies
         manifest["dependencies"] = sorted(new_dependencies)
-
-        current_version = manifest.get("version_number", "")
-        new_version = bump_version(
-            current_version,
-            added_mods=added_mods,
-            updated_mods=updated,
-            removed_mods=removed_mods,
-            force_major_upgrade=args.major_upgrade
-            )
-        
+        new_version = bump_version(current_version, changes, force_major_upgrade=args.major_upgrade)
         manifest["version_number"] = new_version
-        save_manifest(MANIFEST_PATH, manifest, dry_run=args.dry_run)
+
+        notes = None
+        if changes.updated and not args.no_release_notes:
+            # Fetched before the output stage takes its lock, a slow upstream only costs up to the deadline
+            with METRICS.phase("release_notes"):
+                notes = fetch_release_notes(
+                    changes.updated,
+                    THUNDERSTORE_PACKAGE_API,
+                    USER_AGENT,
+                    NotesCache(args.release_notes_cache_dir),
+                    max_workers=args.release_notes_workers,
+                    timeout_time=args.timeout_time,
+                    deadline=args.release_notes_deadline,
+                    offline=args.offline,
+                    warn=log_warning
+                )
+
+        # Everything is rendered first and written together, so an interrupted run never leaves half a release behind
+        try:
+            with OutputStage(pack.directory, dry_run=args.dry_run) as output:
+                with METRICS.phase("write"):
+                    save_manifest(pack.manifest_path, manifest, output=output)
+                    save_snapshot(pack.snapshot_path, changes.next_snapshot, output=output, generation=delta.generation if delta is not None else None)
+                    write_version_txt(new_version, path=pack.version_path, output=output)
+
+                with METRICS.phase("toml"):
+                    output.write(pack.toml_path, render_thunderstore_toml(manifest, warn=log_warning))
+
+                with METRICS.phase("changelog"):
+                    update_changelog(new_version, changes, dry_run=args.dry_run, max_bytes=args.changelog_max_bytes, path=pack.changelog_path, output=output, notes=notes)
+
+                with METRICS.phase("write"):
+                    output.commit()
+        except TimeoutError as e:
+            log_error(f"❌ Error: {e}, not writing {pack.directory}.")
+            sys.exit(1)
 
         colored_new_version = color_bumped_version(current_version, new_version)
         log_info(f"Manifest updated. Version bumped to v{colored_new_version}")
+        for path in output.changed:
+            log_info(f"[Dry Run] Would update {path}" if args.dry_run else f"{path} updated.")
+        for path in output.unchanged:
+            log_info(f"{path} already up to date.")
+        return changes, current_version, new_version
+    finally:
+        LOG_CONTEXT.prefix = ""
 
-        save_snapshot(SNAPSHOT_PATH, new_dependencies, dry_run=args.dry_run)
-        write_version_txt(new_version, dry_run=args.dry_run)
+def update_packs(packs, loaded, thunderstore_lookup, graph, args, delta=None):
+    # Packs only share the read-only lookup, so threads are enough; the rest is file I/O
+    spinner = Spinner(message=f"🔄 Updating {len(packs)} modpacks... ")
+    spinner.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.pack_workers)) as pool:
+            futures = [
+                pool.submit(update_pack, pack, *pack_state, thunderstore_lookup, graph, args, label=f"[{pack.name}] ", delta=delta)
+                for pack, pack_state in zip(packs, loaded)
+            ]
+            results = []
+            for done, future in enumerate(futures, 1):
+                results.append(future.result())
+                spinner.update(done, len(futures))
+        return results
+    finally:
+        spinner.stop()
 
-        if not args.dry_run:
-            safe_run_subprocess(["python", "generate_thunderstore_toml.py"])
+def pack_summary(pack, result):
+    changes, current_version, new_version = result
+    counts = f"📦 {len(changes.added)} added, 🔄 {len(changes.updated)} updated, ❌ {len(changes.removed)} removed"
+    if changes.missing:
+        counts += f", ⚠️ {len(changes.missing)} missing"
+    if new_version is None:
+        return f"{pack.name}: v{current_version} up to date"
+    return f"{pack.name}: v{current_version} → v{new_version} ({counts})"
+
+def resolve_packs(args):
+    if not args.packs:
+        return [Modpack()]
+    packs, unmatched = find_modpacks(args.packs)
+    for pattern in unmatched:
+        log_error(f"❌ No modpack with a {MANIFEST_PATH} matches {pattern}.")
+    if unmatched or not packs:
+        sys.exit(1)
+    return packs
+
+def wanted_names(loaded, resolve_transitive):
+    if resolve_transitive:
+        # Transitive dependencies can be any package of the community
+        return None
+    # Removed mods still need their package URL for the changelog; only snapshots from before it was recorded lack it
+    wanted = set()
+    for manifest, snapshot, _, _ in loaded:
+        wanted |= dependency_names(manifest.get("dependencies", []))
+        wanted |= {full_name for full_name, entry in snapshot.items() if not entry.get("package_url")}
+    return wanted
+
+def download_pack_mods(args, packs, results, thunderstore_lookup):
+    cache = ModCache(args.mods_cache_dir)
+    pack_dependencies = [[dep for dep in changes.dependencies if parse_dependency(dep)] for changes, _, _ in results]
+    # Packages the index does not know would only 404 through every retry; they are reported per pack instead
+    not_found = {dep for changes, _, _ in results for dep in changes.missing}
+    dependencies = list(dict.fromkeys(dep for deps in pack_dependencies for dep in deps if dep not in not_found))
+    if args.dry_run:
+        missing = sum(1 for dep in dependencies if cache.get(dep) is None)
+        log_info(f"[Dry Run] Would download {missing} of {len(dependencies)} mods into {cache.directory}")
+        return
 
+    spinner = Spinner(message=f"📥 Downloading mods into {cache.directory}... ")
+    spinner.start()
+    try:
+        with METRICS.phase("download"):
+            paths, failed, downloaded = download_mods(
+                dependencies,
+                thunderstore_lookup,
+                cache,
+                max_concurrency=args.max_concurrency,
+                timeout_time=args.timeout_time,
+                max_retries=args.max_retries,
+                retry_delay=args.retry_delay,
+                user_agent=USER_AGENT,
+                count_bytes=lambda size: METRICS.count("bytes_downloaded", size)
+            )
+    finally:
+        spinner.stop()
+    METRICS.count("cache_hits", len(paths) - downloaded)
+    log_info(f"Mods: {downloaded} downloaded, {len(paths) - downloaded} already cached.")
+    for dep, error in sorted(failed.items()):
+        log_error(f"❌ Could not download {dep}: {error}")
 
-        # Prepare set of added mod names (namespace-name only)
-        added_mods_basenames = set("-".join(mod.split("-")[:2]) for mod in added_mods)
+    if not args.assemble_dir:
+        return
+    os.makedirs(args.assemble_dir, exist_ok=True)
+    with METRICS.phase("assemble"):
+        for pack, deps in zip(packs, pack_dependencies):
+            manifest = load_manifest(pack.manifest_path)
+            output = os.path.join(args.assemble_dir, f"{manifest.get('name', pack.name)}-{manifest.get('version_number', '0.0.0')}")
+            if args.assemble_zip:
+                output += ".zip"
+            unknown = sorted(dep for dep in deps if dep in not_found)
+            if unknown:
+                log_error(f"❌ Not assembling {output}: {len(unknown)} mods are not on Thunderstore ({', '.join(unknown)}).")
+                continue
+            missing = [dep for dep in deps if dep not in paths]
+            if missing:
+                log_error(f"❌ Not assembling {output}: {len(missing)} mods could not be downloaded.")
+                continue
+            assemble_pack(pack.directory, {dep: paths[dep] for dep in deps}, output, as_zip=args.assemble_zip)
+            log_info(f"Assembled {output} with {len(deps)} mods.")
 
-        # Filter updated_mods to exclude any that were just added
-        for mod in updated_mods:
-            namespace_name = mod.split(" (")[0]  # Extract namespace-name from update string
-            if namespace_name not in added_mods_basenames:
-                filtered_updated_mods.append(mod)
+def run_update(args, packs, loaded, thunderstore_lookup, cache_dir, start_time, delta=None):
+    graph = None
+    if args.resolve_transitive or args.write_closure:
+        with METRICS.phase("transitive"):
+            graph = DependencyGraph.from_lookup(thunderstore_lookup)
 
-        update_changelog(new_version, added_mods, filtered_updated_mods, removed_mods, thunderstore_lookup, dry_run=args.dry_run)
+    if args.packs:
+        results = update_packs(packs, loaded, thunderstore_lookup, graph, args, delta=delta)
     else:
-        log_info("All dependencies are up to date. No changes, skipping thunderstore.toml regeneration.")
+        results = [update_pack(packs[0], *loaded[0], thunderstore_lookup, graph, args, delta=delta)]
+
+    if args.download_mods or args.assemble_dir:
+        download_pack_mods(args, packs, results, thunderstore_lookup)
+
+    # Issue titles name the mod, not the pack, so one sync covers every pack
+    missing = list(dict.fromkeys(dep for changes, _, _ in results for dep in changes.missing))
+    with METRICS.phase("issues"):
+        sync_github_issues(missing, no_issue=args.no_issue, dry_run=args.dry_run, cache_dir=cache_dir, verbose=args.verbose)
 
     elapsed_time = time.time() - start_time
+    if args.packs:
+        changed = sum(1 for _, _, new_version in results if new_version is not None)
+        summary = "\n".join(pack_summary(pack, result) for pack, result in zip(packs, results))
+        filler = f"Updated {changed} of {len(packs)} modpacks in {elapsed_time:.2f} seconds.\n{Fore.BLUE}{summary}"
+    else:
+        changes = results[0][0]
+        filler = f"Update process completed in {elapsed_time:.2f} seconds.\n{Fore.BLUE}Summary: 📦 {len(changes.added)} added, 🔄 {len(changes.updated)} updated, ❌ {len(changes.removed)} removed."
     banner(
         "✅ Done",
-        filler=f"Update process completed in {elapsed_time:.2f} seconds.\n{Fore.BLUE}Summary: 📦 {len(added_mods)} added, 🔄 {len(filtered_updated_mods)} updated, ❌ {len(removed_mods)} removed.",
+        filler=filler,
         color=Fore.GREEN,
         endline=True
         )
+    return results
+
+def watch_signature(loaded, thunderstore_lookup):
+    # What an update run depends on: the manifests, snapshots and constraints, and the latest release of every package they name
+    names = wanted_names(loaded, False)
+    releases = tuple(sorted((name, (thunderstore_lookup.get(name) or {}).get("version")) for name in names))
+    return json.dumps(loaded, sort_keys=True, default=str), releases
+
+def write_heartbeat(path, state):
+    if not path:
+        return
+    try:
+        write_file_atomic(path, json.dumps(dict(state, pid=os.getpid(), updated_at=time.time()), indent=4))
+    except OSError as e:
+        log_warning(f"Could not write heartbeat {path}: {e}")
+
+def watch(args):
+    # Keeps the index open between polls and revalidates it with conditional requests;
+    # the update pipeline only runs when something it depends on changed
+    stop = threading.Event()
+    def request_stop(signum, frame):
+        # Only flag it: the poll in progress finishes its writes first
+        stop.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    heartbeat_path = args.heartbeat_file or os.path.join(args.cache_dir, WATCH_HEARTBEAT_FILE)
+    state = {"status": "starting", "polls": 0, "runs": 0, "last_poll": None, "last_run": None, "last_error": None}
+    write_heartbeat(heartbeat_path, state)
+    log_info(f"Watching {THUNDERSTORE_API} every {args.watch_interval}s (heartbeat: {heartbeat_path}).")
+
+    thunderstore_lookup = None
+    previous = None
+    while not stop.is_set():
+        start_time = time.time()
+        state.update(status="polling", next_poll=None)
+        write_heartbeat(heartbeat_path, state)
+        try:
+            packs = resolve_packs(args)
+            loaded = [load_pack(pack) for pack in packs]
+            generation_before = index_generation(args.cache_dir)
+            with METRICS.phase("fetch"):
+                lookup = fetch_thunderstore_packages(
+                    max_retries=args.max_retries,
+                    retry_delay=args.retry_delay,
+                    timeout_time=args.timeout_time,
+                    verbose=args.verbose,
+                    wanted=wanted_names(loaded, args.resolve_transitive or args.write_closure),
+                    cache_dir=args.cache_dir,
+                    deadline=args.fetch_deadline
+                )
+            if thunderstore_lookup is not None and thunderstore_lookup is not lookup:
+                thunderstore_lookup.close()
+            thunderstore_lookup = lookup
+            state.update(polls=state["polls"] + 1, last_poll=time.time(), last_error=None)
+            delta = current_index_delta(args.cache_dir, thunderstore_lookup)
+            # Only a poll that downloaded a new index has something to report
+            if args.delta_json and delta is not None and delta.generation != generation_before:
+                emit_index_delta(args.delta_json, delta, generation_before)
+
+            if watch_signature(loaded, thunderstore_lookup) != previous:
+                state["status"] = "updating"
+                write_heartbeat(heartbeat_path, state)
+                run_update(args, packs, loaded, thunderstore_lookup, args.cache_dir, start_time, delta=delta)
+                state.update(runs=state["runs"] + 1, last_run=time.time())
+                # Read back what the run wrote, so its own version bumps do not trigger the next run
+                previous = watch_signature([load_pack(pack) for pack in packs], thunderstore_lookup)
+            elif args.verbose:
+                log_info("No manifest package changed since the last run.")
+        except SystemExit:
+            # A failed poll must not take the daemon down; the error is already logged
+            state["last_error"] = time.time()
+        except (DownloadError, requests.RequestException, OSError, ValueError) as e:
+            log_error(f"❌ Poll failed: {e}")
+            state["last_error"] = time.time()
+
+        state.update(status="idle", next_poll=time.time() + args.watch_interval)
+        write_heartbeat(heartbeat_path, state)
+        stop.wait(args.watch_interval)
+
+    if thunderstore_lookup is not None:
+        thunderstore_lookup.close()
+    state.update(status="stopped", next_poll=None)
+    write_heartbeat(heartbeat_path, state)
+    log_info("Watch mode stopped.")
+
+def load_search_index(args):
+    # Built from the cached index body and kept next to it until a download replaces that body
+    try:
+        fetch_thunderstore_packages(
+            max_retries=args.max_retries,
+            retry_delay=args.retry_delay,
+            timeout_time=args.timeout_time,
+            verbose=args.verbose,
+            cache_dir=args.cache_dir,
+            cache_ttl=args.cache_ttl,
+            offline=args.offline,
+            deadline=args.fetch_deadline
+        ).close()
+    except DownloadError as e:
+        log_error(f"❌ Failed to fetch Thunderstore packages: {e}")
+        sys.exit(1)
+    body = os.stat(os.path.join(args.cache_dir, INDEX_CACHE_BODY))
+    source = f"{body.st_size}:{body.st_mtime_ns}"
+    path = os.path.join(args.cache_dir, SEARCH_INDEX_FILE)
+    index = SearchIndex.load(path, source)
+    if index is None:
+        with METRICS.phase("search_index"):
+            index = SearchIndex.build(iter_json_array_items(iter_cached_index(args.cache_dir)), source)
+            index.save(path)
+        if args.verbose:
+            log_info(f"Search index built over {len(index)} packages.")
+    return index
+
+def print_search_hits(hits):
+    width = len(str(len(hits)))
+    for number, hit in enumerate(hits, 1):
+        flags = "".join(f" {Fore.RED}[{flag}]{Style.RESET_ALL}" for flag, on in (("deprecated", hit.deprecated), ("nsfw", hit.nsfw)) if on)
+        print(f"{number:>{width}}. {Fore.CYAN}{hit.full_name}{Style.RESET_ALL} {hit.version}{flags}  ⬇ {hit.downloads:,}  ★ {hit.rating}", flush=True)
+        if hit.description:
+            print(f"{' ' * (width + 2)}{hit.description}", flush=True)
+
+def add_search_hits(args, hits):
+    # Hits are picked by their number in the results or by name; names outside the results are not guessed at
+    by_name = {hit.full_name.lower(): hit for hit in hits}
+    selected = {}
+    for choice in args.add:
+        hit = hits[int(choice) - 1] if choice.isdigit() and 0 < int(choice) <= len(hits) else by_name.get(choice.lower())
+        if hit is None:
+            log_error(f"❌ {choice} is not one of the hits shown.")
+            sys.exit(1)
+        if hit.deprecated:
+            log_warning(f"{hit.full_name} is deprecated.")
+        selected[hit.full_name] = hit.version
+
+    manifest = load_manifest(args.manifest) if os.path.exists(args.manifest) else {}
+    merged, added, upgraded = merge_dependencies(manifest.get("dependencies", []), selected)
+    for dep in added:
+        log_info(f"Adding {dep}")
+    for full_name, old, new in upgraded:
+        log_info(f"Upgrading {full_name} {old} → {new}")
+    if added or upgraded:
+        manifest["dependencies"] = merged
+        save_manifest(args.manifest, manifest, dry_run=args.dry_run)
+    log_info(f"{len(added)} added, {len(upgraded)} upgraded, {len(selected) - len(added) - len(upgraded)} already in {args.manifest}.")
+
+def search(args):
+    if args.no_cache:
+        log_error("❌ search reads the cached index and cannot run with --no-cache.")
+        sys.exit(1)
+    index = load_search_index(args)
+    query = " ".join(args.query)
+    with METRICS.phase("search"):
+        hits = index.search(
+            query,
+            limit=args.limit,
+            sort=args.sort,
+            include_deprecated=args.include_deprecated,
+            include_nsfw=args.include_nsfw,
+            min_similarity=args.min_similarity
+        )
+    if not hits:
+        log_warning(f"No packages match '{query}'.")
+    print_search_hits(hits)
+    if args.add and hits:
+        add_search_hits(args, hits)
+
+def main(args):
+    start_time = time.time()
+    init(autoreset=True)
+
+    if args.command == "search":
+        search(args)
+        return
+
+    print_ascii_logo()
+    announce_mode(args.dry_run)
+
+    if args.watch:
+        if args.no_cache or args.offline:
+            log_error("❌ --watch revalidates the cached index and cannot run with --no-cache or --offline.")
+            sys.exit(1)
+        watch(args)
+        return
+
+    packs = resolve_packs(args)
+    if args.packs:
+        log_info(f"Updating {len(packs)} modpacks: {', '.join(pack.name for pack in packs)}")
+    loaded = [load_pack(pack) for pack in packs]
+    wanted = wanted_names(loaded, args.resolve_transitive or args.write_closure)
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    generation_before = index_generation(cache_dir)
+    with METRICS.phase("fetch"):
+        thunderstore_lookup = load_thunderstore_lookup(args, wanted, cache_dir, needs_index=any(constraints for _, _, constraints, _ in loaded) or bool(args.delta_json))
+    delta = current_index_delta(cache_dir, thunderstore_lookup)
+    if args.delta_json:
+        emit_index_delta(args.delta_json, delta, generation_before)
+
+    run_update(args, packs, loaded, thunderstore_lookup, cache_dir, start_time, delta=delta)
+
+def write_metrics(args, profiler=None):
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        log_info(f"Profile written to {args.profile} (inspect with: python -m pstats {args.profile})")
+    try:
+        if args.metrics_json:
+            METRICS.write_json(args.metrics_json)
+        METRICS.write_step_summary()
+    except OSError as e:
+        log_warning(f"Could not write run metrics: {e}")
 
 
 if __name__ == "__main__":
     args = parse_args()
 
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
     try:
         main(args)
     except KeyboardInterrupt:
@@ -489,4 +1337,7 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         log_error(f"❌ Unexpected error occurred: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        # Failed runs are the ones worth measuring too
+        write_metrics(args, profiler)